@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Catalog Compaction for Text-to-SQL MCP Server
+Strips markdown layout from the schema catalog before it goes into the prompt
+"""
+
+import re
+
+# Markdown layout the model doesn't need: table rules, horizontal rules, cell padding,
+# runs of spaces and blank lines. Content and indentation are kept.
+# A rule line is one flat character class (no nested repeats, so no backtracking
+# blow-up on long dash runs) holding at least three dashes in a row.
+_TABLE_RULE_RE = re.compile(
+    r'^(?=[^\n]*---)[-:| \t]+(?:\n|$)|^[ \t]*(?:\*{3,}|_{3,})[ \t]*(?:\n|$)',
+    re.MULTILINE
+)
+_CELL_PAD_RE = re.compile(r'[ \t]*\|[ \t]*')
+_INNER_SPACE_RE = re.compile(r'(?<=\S)[ \t]{2,}')
+_BLANK_RUN_RE = re.compile(r'\n{3,}')
+
+
+def compact_catalog(text: str) -> str:
+    """Strip markdown layout from the catalog to cut prompt tokens"""
+    text = _TABLE_RULE_RE.sub('', text)
+    text = _CELL_PAD_RE.sub('|', text)
+    text = _INNER_SPACE_RE.sub(' ', text)
+    return _BLANK_RUN_RE.sub('\n\n', text).strip()
@@ -7,12 +7,16 @@ Interactive client using OpenAI to chat with database via natural language
 import asyncio
 import json
 import logging
-from typing import Optional
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aioconsole
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from mcp import ClientSession
+from mcp import ClientSession, types
 from mcp.client.streamable_http import streamablehttp_client
 from mcp.shared.exceptions import McpError
 
@@ -23,8 +27,27 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def keepalive_http_client(
+    headers: Optional[dict] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    auth: Optional[httpx.Auth] = None
+) -> httpx.AsyncClient:
+    """HTTP client for the MCP transport with keep-alive connection pooling"""
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30.0),
+        auth=auth,
+        follow_redirects=True,
+        limits=httpx.Limits(max_keepalive_connections=100, keepalive_expiry=30)
+    )
+
+
 class Text2SQLClient:
-    """Interactive Text-to-SQL client using OpenAI with MCP tools"""
+    """Interactive Text-to-SQL client using OpenAI with MCP tools
+    
+    Use as an async context manager: the MCP session is opened once and
+    reused for every chat turn.
+    """
     
     def __init__(self, server_url: str = "http://localhost:8000/mcp"):
         self.server_url = server_url
@@ -34,42 +57,77 @@ class Text2SQLClient:
         self.openai_client = self.llm_client.get_async_client()
         self.model = self.llm_client.model
         
+        self.session: Optional[ClientSession] = None
+        self.openai_tools: List[Dict[str, Any]] = []
+        self._exit_stack: Optional[AsyncExitStack] = None
+        
         logger.info(f"Text-to-SQL Client initialized with model: {self.model}")
     
-    async def chat_with_database(self, user_message: str) -> str:
-        """Chat with database using natural language"""
+    async def __aenter__(self) -> "Text2SQLClient":
+        """Open the MCP session and load the tool list once"""
+        self._exit_stack = AsyncExitStack()
         try:
-            async with streamablehttp_client(self.server_url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    await session.initialize()
-                    
-                    # Get available tools
-                    tools_response = await session.list_tools()
-                    
-                    # Convert MCP tools to OpenAI format
-                    openai_tools = []
-                    for tool in tools_response.tools:
-                        openai_function = {
-                            "type": "function",
-                            "function": {
-                                "name": tool.name,
-                                "description": tool.description,
-                                "parameters": tool.inputSchema or {
-                                    "type": "object",
-                                    "properties": {},
-                                    "required": []
-                                }
-                            }
+            read_stream, write_stream, _ = await self._exit_stack.enter_async_context(
+                streamablehttp_client(
+                    self.server_url,
+                    httpx_client_factory=keepalive_http_client
+                )
+            )
+            self.session = await self._exit_stack.enter_async_context(
+                ClientSession(
+                    read_stream,
+                    write_stream,
+                    logging_callback=self._on_server_log
+                )
+            )
+            await self.session.initialize()
+            
+            # Get available tools
+            tools_response = await self.session.list_tools()
+            
+            # Convert MCP tools to OpenAI format
+            self.openai_tools = []
+            for tool in tools_response.tools:
+                openai_function = {
+                    "type": "function",
+                    "function": {
+                        "name": tool.name,
+                        "description": tool.description,
+                        "parameters": tool.inputSchema or {
+                            "type": "object",
+                            "properties": {},
+                            "required": []
                         }
-                        openai_tools.append(openai_function)
-                    
-                    logger.info(f"📋 Loaded {len(openai_tools)} database tools")
-                    
-                    # Create system prompt for database queries
-                    messages = [
-                        {
-                            "role": "system",
-                            "content": """You are a helpful database assistant with access to analytics data.
+                    }
+                }
+                self.openai_tools.append(openai_function)
+            
+            logger.info(f"📋 Loaded {len(self.openai_tools)} database tools")
+        except BaseException:
+            await self._exit_stack.aclose()
+            raise
+        
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close the MCP session"""
+        if self._exit_stack:
+            await self._exit_stack.aclose()
+        self._exit_stack = None
+        self.session = None
+    
+    async def chat_with_database(self, user_message: str) -> AsyncIterator[str]:
+        """Chat with database using natural language, yielding the answer as it streams"""
+        try:
+            session = self.session
+            if session is None:
+                raise RuntimeError("Client session is not open; use 'async with Text2SQLClient()'")
+            
+            # Create system prompt for database queries
+            messages = [
+                {
+                    "role": "system",
+                    "content": """You are a helpful database assistant with access to analytics data.
 
 Available tools:
 - text_to_sql: Convert natural language questions to SQL and execute them (auto-fixes errors)
@@ -89,88 +147,104 @@ Examples:
 - "Is the database connected?" → Use health
 
 Be helpful and conversational. Format data results as tables when appropriate."""
-                        },
-                        {
-                            "role": "user",
-                            "content": user_message
-                        }
-                    ]
-                    
-                    # First OpenAI call
-                    response = await self.openai_client.chat.completions.create(
-                        model=self.model,
-                        messages=messages,
-                        tools=openai_tools,
-                        tool_choice="auto",
-                        max_tokens=2000
-                    )
-                    
-                    response_message = response.choices[0].message
-                    messages.append(response_message)
-                    
-                    # Check if tools were called
-                    if response_message.tool_calls:
-                        print(f"\n🔧 Using tools: {[tc.function.name for tc in response_message.tool_calls]}")
-                        
-                        for tool_call in response_message.tool_calls:
-                            tool_name = tool_call.function.name
-                            tool_args = json.loads(tool_call.function.arguments)
-                            
-                            print(f"📞 Calling '{tool_name}' with: {tool_args}")
-                            
-                            try:
-                                # Call MCP tool
-                                result = await session.call_tool(tool_name, tool_args)
-                                
-                                if result.content and len(result.content) > 0:
-                                    content = result.content[0]
-                                    tool_result = content.text if hasattr(content, 'text') else str(content)
-                                else:
-                                    tool_result = "No response from tool"
-                                
-                                # Parse JSON result for better display
-                                try:
-                                    parsed = json.loads(tool_result)
-                                    if parsed.get('success'):
-                                        print(f"✅ Query successful: {parsed.get('row_count', 0)} rows")
-                                        if 'sql' in parsed:
-                                            print(f"📝 SQL: {parsed['sql'][:100]}...")
-                                    else:
-                                        print(f"❌ Query failed: {parsed.get('error', 'Unknown error')}")
-                                except:
-                                    pass
-                                
-                                # Add to messages
-                                messages.append({
-                                    "role": "tool",
-                                    "tool_call_id": tool_call.id,
-                                    "content": tool_result
-                                })
-                                
-                            except McpError as e:
-                                logger.error(f"MCP Error: {e}")
-                                messages.append({
-                                    "role": "tool",
-                                    "tool_call_id": tool_call.id,
-                                    "content": f"Error: {e}"
-                                })
-                        
-                        # Get final response from OpenAI
-                        final_response = await self.openai_client.chat.completions.create(
-                            model=self.model,
-                            messages=messages,
-                            max_tokens=2000
-                        )
-                        
-                        return final_response.choices[0].message.content
+                },
+                {
+                    "role": "user",
+                    "content": user_message
+                }
+            ]
+            
+            # First OpenAI call
+            response = await self.openai_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                tools=self.openai_tools,
+                tool_choice="auto",
+                max_tokens=2000
+            )
+            
+            response_message = response.choices[0].message
+            messages.append(response_message)
+            
+            # Check if tools were called
+            if response_message.tool_calls:
+                print(f"\n🔧 Using tools: {[tc.function.name for tc in response_message.tool_calls]}")
+                
+                # Independent tool calls run concurrently
+                results = await asyncio.gather(
+                    *[self._invoke_tool(session, tc) for tc in response_message.tool_calls],
+                    return_exceptions=True
+                )
+                
+                # Add to messages in the original tool_calls order
+                for tool_call, result in zip(response_message.tool_calls, results):
+                    if isinstance(result, McpError):
+                        logger.error(f"MCP Error: {result}")
+                        tool_result = f"Error: {result}"
+                    elif isinstance(result, BaseException):
+                        raise result
                     else:
-                        # Direct response without tools
-                        return response_message.content
-                        
+                        tool_result = result
+                    
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call.id,
+                        "content": tool_result
+                    })
+                
+                # Stream final response from OpenAI
+                stream = await self.openai_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=2000,
+                    stream=True
+                )
+                
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            else:
+                # Direct response without tools
+                yield response_message.content or ""
+                
         except Exception as e:
             logger.error(f"Error: {e}")
             logger.exception("Chat error details:")
-            return f"Error: {e}"
+            yield f"Error: {e}"
+    
+    async def _on_server_log(self, params: types.LoggingMessageNotificationParams):
+        """Show server progress messages (ctx.info/warning/error) while a tool runs"""
+        print(f"   {params.data}")
+    
+    async def _invoke_tool(self, session: ClientSession, tool_call) -> str:
+        """Call one MCP tool requested by the model and return its text result"""
+        tool_name = tool_call.function.name
+        tool_args = json.loads(tool_call.function.arguments)
+        
+        print(f"📞 Calling '{tool_name}' with: {tool_args}")
+        
+        # Call MCP tool
+        result = await session.call_tool(tool_name, tool_args)
+        
+        if result.content and len(result.content) > 0:
+            content = result.content[0]
+            tool_result = content.text if hasattr(content, 'text') else str(content)
+        else:
+            tool_result = "No response from tool"
+        
+        # Parse JSON result for better display
+        try:
+            parsed = json.loads(tool_result)
+            if parsed.get('success'):
+                print(f"✅ Query successful: {parsed.get('row_count', 0)} rows")
+                if 'sql' in parsed:
+                    print(f"📝 SQL: {parsed['sql'][:100]}...")
+            else:
+                print(f"❌ Query failed: {parsed.get('error', 'Unknown error')}")
+        except:
+            pass
+        
+        return tool_result
     
     async def test_connection(self) -> bool:
         """Test connections to LLM and MCP server"""
@@ -180,12 +254,13 @@ Be helpful and conversational. Format data results as tables when appropriate.""
                 logger.error("LLM not available")
                 return False
             
-            # Test MCP server
-            async with streamablehttp_client(self.server_url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    await session.initialize()
-                    tools = await session.list_tools()
-                    logger.info(f"✅ Connected to MCP server: {len(tools.tools)} tools available")
+            # Test MCP server over the open session
+            if self.session is None:
+                logger.error("MCP session is not open")
+                return False
+            
+            await self.session.send_ping()
+            logger.info(f"✅ Connected to MCP server: {len(self.openai_tools)} tools available")
             
             return True
             
@@ -200,33 +275,43 @@ async def main():
     print("🗄️  Text-to-SQL Interactive Client")
     print("=" * 60)
     
-    # Test LLM connection
+    # LLM credentials are validated lazily by the first real request
     try:
         llm_client = get_llm_client()
-        if not llm_client.test_connection():
-            print("❌ Failed to connect to LLM. Check your API key.")
+        if not llm_client.is_available():
+            print("❌ LLM not configured. Check your API key.")
             return
         
-        print("✅ LLM connection successful!")
-        
         # Show LLM config
         print(f"🔗 Using: OpenAI ({llm_client.model})")
         
         # Create client
         client = Text2SQLClient()
         
-        # Test MCP server
-        if not await client.test_connection():
-            print("❌ MCP server not reachable. Start the server first:")
-            print("   python server.py")
-            return
-        
-        print("✅ Text-to-SQL MCP server connected!")
-        
     except Exception as e:
         print(f"❌ Initialization failed: {e}")
         return
     
+    # Keep one MCP session open for the whole chat
+    try:
+        async with client:
+            # Test MCP server
+            if not await client.test_connection():
+                print("❌ MCP server not reachable. Start the server first:")
+                print("   python server.py")
+                return
+            
+            print("✅ Text-to-SQL MCP server connected!")
+            
+            await chat_loop(client)
+    except Exception as e:
+        print("❌ MCP server not reachable. Start the server first:")
+        print("   python server.py")
+        logger.error(f"MCP connection failed: {e}")
+
+
+async def chat_loop(client: Text2SQLClient):
+    """Interactive question/answer loop"""
     print("\n" + "=" * 60)
     print("🤖 Ready! Ask questions about your database in plain English.")
     print("=" * 60)
@@ -242,7 +327,8 @@ async def main():
     
     while True:
         try:
-            user_input = input("\n💬 You: ").strip()
+            # Async read keeps the event loop (and the MCP session) running while waiting
+            user_input = (await aioconsole.ainput("\n💬 You: ")).strip()
             
             if not user_input:
                 continue
@@ -268,12 +354,14 @@ async def main():
             
             # Get response
             print("\n🔄 Processing...")
-            response = await client.chat_with_database(user_input)
+            print("\n🤖 Assistant:")
+            async for chunk in client.chat_with_database(user_input):
+                print(chunk, end="", flush=True)
             
-            print(f"\n🤖 Assistant:\n{response}")
+            print()
             print("-" * 60)
             
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             print("\n\n👋 Goodbye!")
             break
         except Exception as e:
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+LLM Response Cache for Text-to-SQL MCP Server
+Exact-match cache for chat completions (temperature=0 => deterministic prompts)
+and a semantic index for matching paraphrased questions
+"""
+
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(model: str, messages: list, temperature: float = 0) -> str:
+    """Build a stable cache key for a chat completion request"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU backend (dev / single replica)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def clear(self):
+        self.entries.clear()
+
+
+class RedisBackend:
+    """Shared Redis backend (multiple server replicas)"""
+
+    def __init__(self, url: str, ttl: int):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(f"llm:{key}")
+
+    async def set(self, key: str, value: str):
+        await self.client.set(f"llm:{key}", value, ex=self.ttl)
+
+    async def clear(self):
+        async for key in self.client.scan_iter(match="llm:*"):
+            await self.client.delete(key)
+
+
+class LLMCache:
+    """Cache for LLM responses, Redis-backed when LLM_CACHE_REDIS_URL is set"""
+
+    def __init__(self):
+        self.enabled = os.getenv("ENABLE_LLM_CACHE", "true").lower() == "true"
+        self.hits = 0
+        self.misses = 0
+
+        redis_url = os.getenv("LLM_CACHE_REDIS_URL")
+        if redis_url:
+            self.backend = RedisBackend(redis_url, int(os.getenv("LLM_CACHE_TTL", "86400")))
+            self.backend_name = "redis"
+        else:
+            self.backend = MemoryBackend(int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")))
+            self.backend_name = "memory"
+
+        logger.info(f"LLM cache initialized ({self.backend_name}, enabled={self.enabled})")
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return cached response for key, or None"""
+        if not self.enabled:
+            return None
+
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        """Store response for key"""
+        if not self.enabled:
+            return
+
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    async def clear(self):
+        """Drop all cached responses"""
+        try:
+            await self.backend.clear()
+        except Exception as e:
+            logger.warning(f"LLM cache clear failed: {e}")
+
+
+class SemanticIndex:
+    """Cosine-similarity index mapping question embeddings to query cache keys"""
+
+    GROW_ROWS = 1024
+
+    def __init__(self, threshold: float):
+        import numpy as np
+
+        self.np = np
+        self.threshold = threshold
+        self.keys: list = []
+        self.positions: dict = {}
+        self.matrix = None  # (capacity, dim) float32, rows L2-normalized
+
+    def _normalize(self, embedding):
+        vec = self.np.asarray(embedding, dtype=self.np.float32)
+        norm = self.np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def add(self, key: str, embedding):
+        """Insert or replace the embedding for a cache key"""
+        vec = self._normalize(embedding)
+        if self.matrix is None:
+            self.matrix = self.np.zeros((self.GROW_ROWS, vec.shape[0]), dtype=self.np.float32)
+
+        row = self.positions.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == self.matrix.shape[0]:
+                grown = self.np.zeros((row + self.GROW_ROWS, self.matrix.shape[1]), dtype=self.np.float32)
+                grown[:row] = self.matrix
+                self.matrix = grown
+            self.keys.append(key)
+            self.positions[key] = row
+        self.matrix[row] = vec
+
+    def remove(self, key: str):
+        """Drop a key, moving the last row into its slot"""
+        row = self.positions.pop(key, None)
+        if row is None:
+            return
+        last = len(self.keys) - 1
+        if row != last:
+            moved = self.keys[last]
+            self.keys[row] = moved
+            self.matrix[row] = self.matrix[last]
+            self.positions[moved] = row
+        self.keys.pop()
+
+    def clear(self):
+        """Drop all entries"""
+        self.keys = []
+        self.positions = {}
+        self.matrix = None
+
+    def search(self, embedding) -> Optional[tuple]:
+        """Return (key, score) of the closest question above threshold, or None"""
+        if not self.keys:
+            return None
+        scores = self.matrix[:len(self.keys)] @ self._normalize(embedding)
+        best = int(scores.argmax())
+        if scores[best] < self.threshold:
+            return None
+        return self.keys[best], float(scores[best])
+
+
+def get_llm_cache() -> LLMCache:
+    """Get LLM cache instance"""
+    return LLMCache()
@@ -5,14 +5,23 @@ Simple LLM Client for Text-to-SQL MCP Client
 
 import os
 import logging
+import importlib.util
 from typing import Optional
 from dotenv import load_dotenv
+import httpx
 import openai
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive pool shared by all OpenAI calls; HTTP/2 when the h2 package is installed
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=50, max_connections=100, keepalive_expiry=30.0)
+HTTP_TIMEOUT = httpx.Timeout(60.0)
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_INSTANCE: Optional["LLMClient"] = None
+
 
 class LLMClient:
     """Simple LLM client wrapper for OpenAI"""
@@ -30,8 +39,11 @@ class LLMClient:
         if self.base_url:
             client_kwargs["base_url"] = self.base_url
             
-        self.client = openai.OpenAI(**client_kwargs)
-        self.async_client = openai.AsyncOpenAI(**client_kwargs)
+        # Async only: a sync client called from the async server/client would block the event loop
+        self.async_client = openai.AsyncOpenAI(
+            **client_kwargs,
+            http_client=httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        )
         
         logger.info(f"LLM Client initialized with model: {self.model}")
     
@@ -40,24 +52,26 @@ class LLMClient:
         return self.async_client
     
     def is_available(self) -> bool:
-        """Check if LLM client is available"""
+        """Check if LLM client is configured (no network call)"""
+        return bool(self.api_key)
+    
+    async def ping(self) -> bool:
+        """Verify credentials and model with a free models.retrieve call"""
         try:
-            # Simple test call
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=1
-            )
+            await self.async_client.models.retrieve(self.model)
             return True
         except Exception as e:
             logger.error(f"LLM availability check failed: {e}")
             return False
     
-    def test_connection(self) -> bool:
+    async def test_connection(self) -> bool:
         """Test connection to LLM service"""
-        return self.is_available()
+        return await self.ping()
 
 
 def get_llm_client() -> LLMClient:
-    """Get LLM client instance"""
-    return LLMClient()
+    """Get the shared LLM client instance"""
+    global _INSTANCE
+    if _INSTANCE is None:
+        _INSTANCE = LLMClient()
+    return _INSTANCE
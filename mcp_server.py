@@ -5,22 +5,30 @@ FastMCP 2.12.1 + Streamable HTTP
 """
 
 import os
-import json
+import re
+import time
+import asyncio
+import hashlib
+import threading
+import uuid
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List
-from decimal import Decimal
-import hashlib
+from typing import Dict, Any, List, Optional, Callable
+from collections import OrderedDict
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from fastmcp import FastMCP, Context
 from dotenv import load_dotenv
 
 # Import shared LLM client
 from llm_client import get_llm_client
+from llm_cache import SemanticIndex, get_llm_cache, make_cache_key
+from rate_limiter import RateLimitedLLM
+from catalog import compact_catalog
+from serialization import dump_json, format_rows, serialize_rows
+from sql_text import analyze_sql, extract_sql, find_sql, sanitize_sql, sql_is_complete
 
 # Load environment
 load_dotenv()
@@ -29,7 +37,33 @@ load_dotenv()
 DB_CONNECTION = os.getenv("DB_CONNECTION_STRING")
 CATALOG_PATH = os.getenv("CATALOG_PATH", "database_catalog.md")
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "5"))
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+QUERY_TIMEOUT = int(os.getenv("QUERY_TIMEOUT", "30"))  # seconds per statement
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "5"))  # seconds a DB probe result is reused
+DB_PING_INTERVAL = int(os.getenv("DB_PING_INTERVAL", "60"))  # seconds between idle pings; 0 disables
+MAX_INFLIGHT_LLM = int(os.getenv("MAX_INFLIGHT_LLM", "10"))
+PLAN_MAX_TOKENS = int(os.getenv("PLAN_MAX_TOKENS", "1200"))  # fused plan + SQL reply
+SQL_MAX_TOKENS = int(os.getenv("SQL_MAX_TOKENS", "600"))  # SQL-only replies
+MODEL_CONTEXT_WINDOW = int(os.getenv("MODEL_CONTEXT_WINDOW", "128000"))
 ENABLE_QUERY_CACHE = os.getenv("ENABLE_QUERY_CACHE", "true").lower() == "true"
+QUERY_CACHE_MAX = int(os.getenv("QUERY_CACHE_MAX", "10000"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "86400"))  # seconds; 0 never expires
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")  # SQLite file; empty keeps the cache in memory only
+ENABLE_SEMANTIC_CACHE = os.getenv("ENABLE_SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+MAX_RESULT_ROWS = 1000
+MAX_SQL_LEN = int(os.getenv("MAX_SQL_LEN", "65536"))  # characters
+ENABLE_EXPLAIN_PREFLIGHT = os.getenv("ENABLE_EXPLAIN_PREFLIGHT", "false").lower() == "true"
+ENABLE_SPECULATIVE_RETRY = os.getenv("ENABLE_SPECULATIVE_RETRY", "false").lower() == "true"
+COMPACT_CATALOG = os.getenv("COMPACT_CATALOG", "true").lower() == "true"
+SIMPLE_QUERY_MAX_WORDS = int(os.getenv("SIMPLE_QUERY_MAX_WORDS", "8"))  # 0 always plans first
+STREAM_CURSOR_TTL = float(os.getenv("STREAM_CURSOR_TTL", "45"))  # idle seconds before an open result stream is closed
+# Server-side cutoff for idle transactions; always outlives a stream cursor's TTL
+IDLE_TX_TIMEOUT = max(60, int(STREAM_CURSOR_TTL) + 15)  # seconds
+STREAM_MAX_OPEN = int(os.getenv("STREAM_MAX_OPEN", "4"))  # pooled connections result streams may hold at once
 
 # Logging
 logging.basicConfig(
@@ -46,36 +80,135 @@ if not DB_CONNECTION:
 # Initialize
 mcp = FastMCP("text2sql")
 llm_client = get_llm_client()
-db_pool = SimpleConnectionPool(2, 10, DB_CONNECTION)
+llm_cache = get_llm_cache()
+rate_limiter = RateLimitedLLM(llm_client.model)
+# Backpressure: bound concurrent LLM calls across all requests
+llm_semaphore = asyncio.Semaphore(MAX_INFLIGHT_LLM)
+# Thread-safe pool: queries run in worker threads via asyncio.to_thread.
+# Timeouts are set once per connection (startup options) instead of once per query.
+# Transactions default to read-only, so SQL that slips past validate_sql still can't
+# write; a database role with only SELECT grants remains the real boundary.
+# The pool opens DB_POOL_MIN connections up front, so the first requests skip the
+# handshake; TCP keepalives stop NATs/load balancers from dropping idle ones.
+db_pool = ThreadedConnectionPool(
+    DB_POOL_MIN, DB_POOL_MAX, DB_CONNECTION,
+    options=(
+        f"-c statement_timeout={QUERY_TIMEOUT * 1000}"
+        f" -c idle_in_transaction_session_timeout={IDLE_TX_TIMEOUT * 1000}"
+        " -c default_transaction_read_only=on"
+    ),
+    connect_timeout=5,
+    keepalives=1,
+    keepalives_idle=30,
+    keepalives_interval=10,
+    keepalives_count=3
+)
+# asyncio.to_thread would run up to min(32, cpu+4) checkouts at once, and the pool raises
+# PoolError beyond DB_POOL_MAX; leave room for the connections open streams hold
+db_semaphore = asyncio.Semaphore(max(1, DB_POOL_MAX - STREAM_MAX_OPEN))
 
 # Load catalog
 catalog_content = ""
 if Path(CATALOG_PATH).exists():
     with open(CATALOG_PATH, 'r') as f:
-        catalog_content = f.read()
+        # Normalize line endings and trailing whitespace so every replica builds a
+        # byte-identical schema prefix (and the same prompt_cache_key)
+        catalog_content = "\n".join(line.rstrip() for line in f.read().splitlines()).strip()
     logger.info(f"✅ Loaded catalog: {len(catalog_content)} chars")
 else:
     logger.warning(f"⚠️ Catalog not found: {CATALOG_PATH}")
 
 # ============================================================================
-# Query Cache (Simple in-memory for POC)
+# Query Cache (bounded in-memory LRU)
 # ============================================================================
 
-query_cache = {}  # {query_hash: {sql, success, results, timestamp}}
+query_cache = OrderedDict()  # LRU {normalized query: {query, sql, success, results, timestamp, size}}
+query_cache_bytes = 0  # running total of entry sizes, kept in step with inserts/evictions
+
+# Paraphrase matching: question embeddings -> query_cache keys
+semantic_index = (
+    SemanticIndex(SEMANTIC_CACHE_THRESHOLD)
+    if ENABLE_QUERY_CACHE and ENABLE_SEMANTIC_CACHE else None
+)
+
+# Lookup counters reported by get_cache_stats
+cache_counters = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+
+# Optional SQLite persistence behind the in-memory LRU (sqlite3 only imported when used)
+query_store = None
+if ENABLE_QUERY_CACHE and QUERY_CACHE_PATH:
+    from query_store import QueryStore
+    query_store = QueryStore(QUERY_CACHE_PATH)
+
+# Running text_to_sql pipelines, so concurrent duplicate questions share one
+inflight_queries: Dict[tuple, tuple[asyncio.Task, "SharedProgress"]] = {}
+
 
-def cache_query(query: str, sql: str, success: bool, results: Dict = None):
+def normalize_query(query: str) -> str:
+    """Cache key for a question (the dict hashes the string itself)"""
+    return query.lower().strip()
+
+
+def _entry_size(sql: str, results: Dict | None) -> int:
+    """Approximate payload size of a cache entry in bytes"""
+    size = len(sql)
+    if results:
+        size += sum(len(str(row)) for row in results['rows'])
+    return size
+
+
+def _expired(entry: Dict) -> bool:
+    """True when an entry has outlived QUERY_CACHE_TTL"""
+    return QUERY_CACHE_TTL > 0 and time.time() - entry.get('created_at', 0) > QUERY_CACHE_TTL
+
+def _drop_cached(key: str):
+    """Remove one entry from the LRU, the semantic index and the store"""
+    global query_cache_bytes
+    entry = query_cache.pop(key, None)
+    if entry:
+        query_cache_bytes -= entry['size']
+    if semantic_index is not None:
+        semantic_index.remove(key)
+    if query_store is not None:
+        query_store.delete(key)
+
+def cache_query(
+    query: str,
+    sql: str,
+    success: bool,
+    results: Dict = None,
+    embedding: List[float] = None
+):
     """Cache successful queries for reuse"""
-    if not ENABLE_QUERY_CACHE:
+    global query_cache_bytes
+    if not ENABLE_QUERY_CACHE or not success:
         return
     
-    query_hash = hashlib.md5(query.lower().strip().encode()).hexdigest()
-    query_cache[query_hash] = {
+    key = normalize_query(query)
+    previous = query_cache.pop(key, None)
+    if previous:
+        query_cache_bytes -= previous['size']
+    
+    entry = {
         'query': query,
         'sql': sql,
         'success': success,
-        'results': results if success else None,
-        'timestamp': datetime.now().isoformat()
+        'results': results,
+        'timestamp': datetime.now().isoformat(),
+        'created_at': time.time(),
+        'size': _entry_size(sql, results)
     }
+    query_cache[key] = entry
+    query_cache_bytes += entry['size']
+    if semantic_index is not None and embedding is not None:
+        semantic_index.add(key, embedding)
+    if query_store is not None:
+        query_store.save(key, entry, embedding)
+    
+    # Evict least recently used entries
+    while len(query_cache) > QUERY_CACHE_MAX:
+        _drop_cached(next(iter(query_cache)))
+    
     logger.info(f"📦 Cached query: {query[:50]}...")
 
 def get_cached_query(query: str) -> Dict | None:
@@ -83,15 +216,78 @@ def get_cached_query(query: str) -> Dict | None:
     if not ENABLE_QUERY_CACHE:
         return None
     
-    query_hash = hashlib.md5(query.lower().strip().encode()).hexdigest()
-    cached = query_cache.get(query_hash)
+    key = normalize_query(query)
+    cached = query_cache.get(key)
+    if cached and _expired(cached):
+        _drop_cached(key)
+        cached = None
     
     if cached and cached['success']:
+        query_cache.move_to_end(key)
+        cache_counters['exact_hits'] += 1
         logger.info(f"🎯 Cache hit for: {query[:50]}...")
         return cached
     
+    if semantic_index is None:
+        cache_counters['misses'] += 1
     return None
 
+async def embed_query(query: str) -> List[float] | None:
+    """Embed a question for semantic cache lookup"""
+    try:
+        async with llm_semaphore:
+            response = await llm_client.async_client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=normalize_query(query)
+            )
+        return response.data[0].embedding
+    except Exception as e:
+        logger.warning(f"Embedding failed, skipping semantic cache: {e}")
+        return None
+
+def get_similar_cached_query(embedding: List[float] | None) -> Dict | None:
+    """Find a cached query whose question is semantically equivalent"""
+    if semantic_index is None:
+        return None
+    
+    match = semantic_index.search(embedding) if embedding is not None else None
+    if not match:
+        cache_counters['misses'] += 1
+        return None
+    
+    # Paraphrase hits expire; the exact-match path is unaffected
+    key, score = match
+    cached = query_cache.get(key)
+    if cached and _expired(cached):
+        _drop_cached(key)
+        cached = None
+    if not cached or time.time() - cached.get('created_at', 0) > SEMANTIC_CACHE_TTL:
+        semantic_index.remove(key)
+        cache_counters['misses'] += 1
+        return None
+    
+    query_cache.move_to_end(key)
+    cache_counters['semantic_hits'] += 1
+    logger.info(f"🧭 Semantic cache hit ({score:.3f}) for: {cached['query'][:50]}...")
+    return cached
+
+def load_persisted_queries():
+    """Warm the in-memory cache from the SQLite store"""
+    global query_cache_bytes
+    for key, entry, embedding in query_store.load(QUERY_CACHE_MAX):
+        if _expired(entry):
+            query_store.delete(key)
+            continue
+        query_cache[key] = entry
+        query_cache_bytes += entry['size']
+        if semantic_index is not None and embedding is not None:
+            semantic_index.add(key, embedding)
+    logger.info(f"📦 Loaded {len(query_cache)} cached queries from {QUERY_CACHE_PATH}")
+
+
+if query_store is not None:
+    load_persisted_queries()
+
 # ============================================================================
 # Relationship Map (Define your schema relationships)
 # ============================================================================
@@ -108,64 +304,73 @@ IMPORTANT JOIN PATTERNS:
 - For user activity by LOB: users → usage_records → group by users.lob
 """
 
+PROMPT_CATALOG = compact_catalog(catalog_content) if COMPACT_CATALOG else catalog_content
+
+# Static schema block sent as the system message of every LLM call. It must be
+# byte-identical across calls so OpenAI's automatic prompt caching can reuse it.
+SCHEMA_SYSTEM_PROMPT = f"""You are a PostgreSQL expert working with the database described below.
+
+DATABASE SCHEMA:
+{PROMPT_CATALOG}
+
+{RELATIONSHIP_MAP}"""
+SCHEMA_PROMPT_TOKENS = rate_limiter.cache_token_count(SCHEMA_SYSTEM_PROMPT)
+
+# Routes every call sharing this schema prefix to the same OpenAI prompt-cache shard.
+# Only sent to api.openai.com; OpenAI-compatible gateways may reject unknown fields.
+PROMPT_CACHE_KEY = f"schema:{hashlib.sha256(SCHEMA_SYSTEM_PROMPT.encode()).hexdigest()[:16]}"
+LLM_EXTRA_BODY = {} if llm_client.base_url else {"prompt_cache_key": PROMPT_CACHE_KEY}
+
 # ============================================================================
 # Utilities
 # ============================================================================
 
-def serialize_value(value):
-    """Convert DB values to JSON-serializable"""
-    if value is None:
-        return None
-    if isinstance(value, datetime):
-        return value.isoformat()
-    if isinstance(value, Decimal):
-        return float(value)
-    if isinstance(value, bytes):
-        return value.hex()[:50]
-    return str(value)
+# Errors that mean the SQL has the wrong shape; fix_sql cannot repair these
+UNFIXABLE_VALIDATION_ERRORS = {"Only SELECT queries allowed", "Multiple statements not allowed", "SQL too long"}
 
 
 def validate_sql(sql: str) -> tuple[bool, str]:
     """Validate SQL is safe"""
-    sql_upper = sql.strip().upper()
-    
-    if not sql_upper.startswith('SELECT') and not sql_upper.startswith('WITH'):
-        return False, "Only SELECT queries allowed"
-    
-    dangerous = ['DROP', 'DELETE', 'UPDATE', 'INSERT', 'TRUNCATE', 'ALTER', 'CREATE']
-    for keyword in dangerous:
-        if f' {keyword} ' in f' {sql_upper} ':
-            return False, f"Keyword '{keyword}' not allowed"
-    
-    if sql.count(';') > 1:
-        return False, "Multiple statements not allowed"
+    # Checked before analyze_sql, so oversized strings never become its cache keys
+    if len(sql) > MAX_SQL_LEN:
+        return False, "SQL too long"
     
-    return True, ""
+    is_valid, error, _ = analyze_sql(sql)
+    # Logged here, outside the cache, so every repeat of a blocked statement shows up
+    if error.startswith("Keyword"):
+        logger.warning(f"🛡️ Blocked SQL: {error}")
+    return is_valid, error
 
 
-def execute_sql(sql: str) -> Dict[str, Any]:
-    """Execute SQL query"""
+def _execute_sql_blocking(sql: str, limit: int) -> Dict[str, Any]:
+    """Execute SQL query (blocking, runs in a worker thread)"""
+    limit = max(1, min(limit, MAX_RESULT_ROWS))
     sql_clean = sql.strip().rstrip(';')
-    if 'LIMIT' not in sql_clean.upper():
-        sql_clean += " LIMIT 1000"
+    own_limit = analyze_sql(sql)[2]  # cached by validate_sql
+    if not own_limit:
+        sql_clean += f" LIMIT {limit}"
     
     conn = None
     cursor = None
-    start = datetime.now()
+    start = time.perf_counter()
     
     try:
         conn = db_pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SET statement_timeout = 30000")
+        if own_limit:
+            # The SQL's own LIMIT may be far larger than requested; a server-side
+            # cursor keeps the rest of the result set from crossing the wire
+            cursor = conn.cursor(name=f"text2sql_{uuid.uuid4().hex}")
+        else:
+            cursor = conn.cursor()
         cursor.execute(sql_clean)
         
-        rows = cursor.fetchall()
+        # One extra row tells whether more rows exist beyond the limit
+        rows = cursor.fetchmany(limit + 1)
+        truncated = len(rows) > limit if own_limit else len(rows) == limit
+        rows = rows[:limit]
         columns = [desc[0] for desc in cursor.description] if cursor.description else []
         
-        serialized = [
-            {k: serialize_value(v) for k, v in dict(row).items()}
-            for row in rows
-        ]
+        serialized = serialize_rows(rows, len(columns))
         
         return {
             'success': True,
@@ -173,15 +378,25 @@ def execute_sql(sql: str) -> Dict[str, Any]:
             'columns': columns,
             'rows': serialized,
             'row_count': len(serialized),
-            'execution_time': (datetime.now() - start).total_seconds()
+            'truncated': truncated,
+            'execution_time': time.perf_counter() - start
         }
         
+    except PoolError as e:
+        # Says nothing about the SQL, so text_to_sql must not send it to the fix step
+        return {
+            'success': False,
+            'sql': sql_clean,
+            'error': f"Database busy: {e}",
+            'infrastructure_error': True,
+            'execution_time': time.perf_counter() - start
+        }
     except Exception as e:
         return {
             'success': False,
             'sql': sql_clean,
             'error': str(e),
-            'execution_time': (datetime.now() - start).total_seconds()
+            'execution_time': time.perf_counter() - start
         }
     finally:
         if cursor:
@@ -190,169 +405,524 @@ def execute_sql(sql: str) -> Dict[str, Any]:
             db_pool.putconn(conn)
 
 
-# ============================================================================
-# Two-Stage SQL Generation with Chain-of-Thought
-# ============================================================================
-
-async def generate_query_plan(user_query: str, catalog: str, ctx: Context = None) -> str:
-    """
-    Stage 1: Generate reasoning plan (Chain-of-Thought)
-    """
-    
-    if ctx:
-        await ctx.info("🧠 Stage 1: Generating query plan...")
+def _explain_sql_blocking(sql: str) -> Optional[str]:
+    """Plan SQL with EXPLAIN (no execution); return the planner error, if any"""
+    conn = None
+    cursor = None
     
-    prompt = f"""You are a SQL query planner. Break down how to answer this question using the database.
+    try:
+        conn = db_pool.getconn()
+        cursor = conn.cursor()
+        cursor.execute("SET LOCAL statement_timeout = 2000")
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql.strip().rstrip(';')}")
+        cursor.fetchone()
+        return None
+    except PoolError:
+        return None  # no connection to spare; skip the pre-flight rather than blame the SQL
+    except Exception as e:
+        return str(e)
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            db_pool.putconn(conn)
 
-DATABASE SCHEMA:
-{catalog}
 
-{RELATIONSHIP_MAP}
+async def explain_sql(sql: str) -> Optional[str]:
+    """Pre-flight planner check without blocking the event loop"""
+    async with db_semaphore:
+        return await asyncio.to_thread(_explain_sql_blocking, sql)
 
-USER QUESTION: {user_query}
 
-INSTRUCTIONS:
-Think step-by-step and create a query plan. Include:
-1. Which tables are needed
-2. What columns to select
-3. How to join tables (use relationship map)
-4. What filters to apply
-5. Any aggregations needed
-6. Sort order if relevant
+async def execute_sql(sql: str, limit: int = MAX_RESULT_ROWS) -> Dict[str, Any]:
+    """Execute SQL query without blocking the event loop"""
+    async with db_semaphore:
+        return await asyncio.to_thread(_execute_sql_blocking, sql, limit)
+
+
+# Paged result streams: handle -> {'conn', 'cursor', 'columns', 'chunk_size', 'expires'}.
+# Each open stream holds a pooled connection, so at most STREAM_MAX_OPEN exist at once.
+open_streams: Dict[str, Dict[str, Any]] = {}
+streams_lock = threading.Lock()
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_OPEN)
+
+
+def _close_stream(stream: Dict[str, Any]):
+    """Close a stream's cursor, return its connection to the pool and free its slot"""
+    conn = stream['conn']
+    if conn is not None:
+        healthy = True
+        try:
+            if stream['cursor'] is not None:
+                stream['cursor'].close()
+            conn.rollback()
+        except Exception:
+            healthy = False
+        db_pool.putconn(conn, close=not healthy)
+    stream_slots.release()
+
+
+def _sweep_streams():
+    """Close streams nobody fetched from within STREAM_CURSOR_TTL"""
+    now = time.monotonic()
+    with streams_lock:
+        expired = [handle for handle, stream in open_streams.items() if stream['expires'] <= now]
+        stale = [open_streams.pop(handle) for handle in expired]
+    for stream in stale:
+        _close_stream(stream)
+    if stale:
+        logger.info(f"🧹 Closed {len(stale)} expired result stream(s)")
+
+
+def _stream_chunk(handle: str, stream: Dict[str, Any], rows: List[tuple], start: float) -> Dict[str, Any]:
+    """Build a chunk response; park the stream for the next fetch, or close it when drained"""
+    done = len(rows) < stream['chunk_size']
+    if done:
+        _close_stream(stream)
+    else:
+        stream['expires'] = time.monotonic() + STREAM_CURSOR_TTL
+        with streams_lock:
+            open_streams[handle] = stream
+    
+    return {
+        'success': True,
+        'columns': stream['columns'],
+        'rows': serialize_rows(rows, len(stream['columns'])),
+        'row_count': len(rows),
+        'done': done,
+        'cursor_handle': None if done else handle,
+        'execution_time': time.perf_counter() - start
+    }
+
+
+def _open_stream_blocking(sql: str, chunk_size: int) -> Dict[str, Any]:
+    """Open a server-side cursor and read its first chunk (blocking, runs in a worker thread)"""
+    _sweep_streams()
+    if not stream_slots.acquire(blocking=False):
+        return {'success': False, 'sql': sql, 'error': f"Too many open result streams (max {STREAM_MAX_OPEN})"}
+    
+    stream = {'conn': None, 'cursor': None, 'chunk_size': chunk_size}
+    start = time.perf_counter()
+    
+    try:
+        stream['conn'] = db_pool.getconn()
+        # Pin this transaction read-only before the caller's SQL runs in it
+        with stream['conn'].cursor() as setup:
+            setup.execute("SET TRANSACTION READ ONLY")
+        stream['cursor'] = stream['conn'].cursor(name=f"text2sql_{uuid.uuid4().hex}")
+        stream['cursor'].execute(sql)
+        rows = stream['cursor'].fetchmany(chunk_size)
+        description = stream['cursor'].description
+        stream['columns'] = [desc[0] for desc in description] if description else []
+    except Exception as e:
+        _close_stream(stream)
+        return {
+            'success': False,
+            'sql': sql,
+            'error': str(e),
+            'execution_time': time.perf_counter() - start
+        }
+    
+    return {'sql': sql, **_stream_chunk(uuid.uuid4().hex, stream, rows, start)}
 
-Return your plan as a numbered list. Be specific about table names and columns.
 
-QUERY PLAN:"""
+def _fetch_stream_blocking(handle: str) -> Dict[str, Any]:
+    """Read the next chunk of an open stream (blocking, runs in a worker thread)"""
+    _sweep_streams()
+    # Taken out of the registry while fetching, so one cursor is never read concurrently
+    with streams_lock:
+        stream = open_streams.pop(handle, None)
+    if stream is None:
+        return {'success': False, 'error': "Unknown or expired cursor_handle"}
+    
+    start = time.perf_counter()
+    try:
+        rows = stream['cursor'].fetchmany(stream['chunk_size'])
+    except Exception as e:
+        _close_stream(stream)
+        return {'success': False, 'error': str(e), 'execution_time': time.perf_counter() - start}
     
-    response = llm_client.client.chat.completions.create(
+    return _stream_chunk(handle, stream, rows, start)
+
+
+async def _stream_until(
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    stop_when: Callable[[str], bool]
+) -> tuple[str, Any, Optional[str]]:
+    """Stream a completion and close it as soon as stop_when(text) holds"""
+    stream = await llm_client.async_client.chat.completions.create(
         model=llm_client.model,
-        max_tokens=1500,
+        max_tokens=max_tokens,
         temperature=0,
-        messages=[{"role": "user", "content": prompt}]
+        messages=messages,
+        extra_body=LLM_EXTRA_BODY,
+        stream=True,
+        stream_options={"include_usage": True}
     )
     
-    plan = response.choices[0].message.content.strip()
-    logger.info(f"📋 Query Plan:\n{plan}")
+    parts = []
+    usage = None
+    finish_reason = None
+    try:
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].finish_reason:
+                finish_reason = chunk.choices[0].finish_reason
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            
+            delta = chunk.choices[0].delta.content
+            parts.append(delta)
+            if ('`' in delta or '\n' in delta or ';' in delta) and stop_when(''.join(parts)):
+                logger.info("✂️ SQL complete, closing LLM stream early")
+                finish_reason = 'early_stop'
+                break
+    finally:
+        await stream.close()
     
-    return plan
+    return ''.join(parts), usage, finish_reason
 
 
-async def generate_sql_from_plan(
-    user_query: str,
-    plan: str,
-    catalog: str,
-    ctx: Context = None
+def token_budget(text: str, base: int, cap: int) -> int:
+    """max_tokens for a request: base plus 2 per word of its variable text, capped"""
+    return min(cap, base + 2 * len(text.split()))
+
+
+async def chat_completion(
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    stop_when: Callable[[str], bool] | None = None,
+    use_cache: bool = True
 ) -> str:
+    """Run a chat completion, serving repeated prompts from the LLM cache
+    
+    With stop_when, the response is streamed and cut off once the predicate holds.
+    With use_cache=False the cache is not read, but the fresh reply still replaces it.
     """
-    Stage 2: Generate SQL based on the reasoning plan
-    """
+    cache_key = make_cache_key(llm_client.model, messages, temperature=0)
+    cached = await llm_cache.get(cache_key) if use_cache else None
+    if cached is not None:
+        logger.info("🎯 LLM cache hit")
+        return cached
     
-    if ctx:
-        await ctx.info("⚙️ Stage 2: Generating SQL from plan...")
+    # Never ask for more output than the context window leaves room for
+    prompt_tokens = rate_limiter.prompt_tokens(messages)
+    room = max(1, MODEL_CONTEXT_WINDOW - prompt_tokens - 64)
     
-    prompt = f"""You are a PostgreSQL expert. Generate SQL based on this query plan.
+    # Budgets are sized tight; a truncated reply gets one retry with double the room
+    for budget in (min(max_tokens, room), min(max_tokens * 2, room)):
+        await rate_limiter.acquire(messages, budget, prompt_tokens)
+        
+        async with llm_semaphore:
+            if stop_when is None:
+                response = await llm_client.async_client.chat.completions.create(
+                    model=llm_client.model,
+                    max_tokens=budget,
+                    temperature=0,
+                    messages=messages,
+                    extra_body=LLM_EXTRA_BODY
+                )
+                choice = response.choices[0]
+                content, usage, finish_reason = choice.message.content, response.usage, choice.finish_reason
+            else:
+                content, usage, finish_reason = await _stream_until(messages, budget, stop_when)
+        
+        if finish_reason != 'length':
+            break
+        logger.warning(f"⚠️ Completion truncated at max_tokens={budget}")
+    
+    details = getattr(usage, 'prompt_tokens_details', None) if usage else None
+    if details is not None:
+        logger.info(
+            f"🧮 Prompt tokens: {usage.prompt_tokens} "
+            f"({details.cached_tokens or 0} served from prompt cache)"
+        )
+    
+    content = content.strip()
+    # A reply cut off before any SQL would replay the same failure from the cache
+    if finish_reason != 'early_stop' or find_sql(content) is not None:
+        await llm_cache.set(cache_key, content)
+    
+    return content
 
-DATABASE SCHEMA:
-{catalog}
 
-{RELATIONSHIP_MAP}
+# ============================================================================
+# Two-Stage SQL Generation with Chain-of-Thought
+# ============================================================================
+
+_SQL_HEADER_RE = re.compile(r'^[*#\s]*SQL[*\s]*:[*\s]*', re.IGNORECASE | re.MULTILINE)
+_PLAN_HEADER_RE = re.compile(r'^[*#\s]*PLAN[*\s]*:[*\s]*', re.IGNORECASE)
 
-USER QUESTION: {user_query}
 
-QUERY PLAN:
-{plan}
+# Static instruction blocks, built once. Each user message starts with one of these and
+# ends with the per-request details, so the cacheable prefix runs past the schema.
+PLAN_AND_SQL_INSTRUCTIONS = """Plan how to answer the question below using the database, then write the SQL.
 
 INSTRUCTIONS:
+First think step-by-step and create a query plan. Include:
+1. Which tables are needed
+2. What columns to select
+3. How to join tables (use relationship map)
+4. What filters to apply
+5. Any aggregations needed
+6. Sort order if relevant
+
+Be specific about table names and columns.
+
+Then write the PostgreSQL query:
 - Follow the plan exactly
 - Use proper JOIN syntax based on relationships
 - Use table aliases (e.g., users u, usage_records ur)
 - Column names are case-sensitive
-- Return ONLY the SQL query, no explanations
 
-SQL:"""
+Respond in exactly this format:
+PLAN:
+<numbered list>
+
+SQL:
+<query only, ending with a semicolon, no explanations>"""
+
+FIX_PLANNED_SQL_INSTRUCTIONS = """That SQL failed. Fix it.
+
+INSTRUCTIONS:
+- The plan is correct, but SQL has an error
+- Fix the SQL based on the error message
+- Keep following the original plan
+- Common issues: wrong column names, missing JOINs, type mismatches
+- Do not return any SQL that already failed above
+- Return ONLY the corrected SQL, ending with a semicolon"""
+
+FIX_SQL_INSTRUCTIONS = """That SQL failed. Fix it.
+
+INSTRUCTIONS:
+- Fix the SQL based on the error message
+- Common issues: wrong column names, missing JOINs, type mismatches
+- Do not return any SQL that already failed above
+- Return ONLY the corrected SQL, ending with a semicolon"""
+
+DIRECT_SQL_INSTRUCTIONS = """Write the SQL for the question below.
+
+INSTRUCTIONS:
+- Write the PostgreSQL query that answers the question
+- Use proper JOIN syntax based on relationships
+- Use table aliases (e.g., users u, usage_records ur)
+- Column names are case-sensitive
+- Return ONLY the SQL, ending with a semicolon"""
+
+ALTERNATIVE_SQL_INSTRUCTIONS = """Write an alternative SQL query for the question below.
+
+INSTRUCTIONS:
+- The first SQL may fail; write a different query that answers the same question
+- Keep following the original plan
+- Prefer other column or join choices where the first SQL could be wrong
+- Return ONLY the SQL, ending with a semicolon"""
+
+
+def split_plan_and_sql(text: str) -> tuple[str, str]:
+    """Split a 'PLAN: ... SQL: ...' reply into (plan, sql)"""
+    match = _SQL_HEADER_RE.search(text)
+    if not match:
+        return text.strip(), extract_sql(text)
     
-    response = llm_client.client.chat.completions.create(
-        model=llm_client.model,
-        max_tokens=2000,
-        temperature=0,
-        messages=[{"role": "user", "content": prompt}]
+    plan = _PLAN_HEADER_RE.sub('', text[:match.start()].strip())
+    return plan.strip(), extract_sql(text[match.end():])
+
+
+def plan_and_sql_is_complete(text: str) -> bool:
+    """True once the SQL after the 'SQL:' marker of a fused reply is finished"""
+    match = _SQL_HEADER_RE.search(text)
+    return bool(match) and sql_is_complete(text[match.end():])
+
+
+# Words suggesting joins, grouping or comparisons, which benefit from a plan
+_COMPLEX_QUESTION_RE = re.compile(
+    r'\b(?:and|or|join|group|per|each|by|compare|versus|vs|between|trend|rank)\b',
+    re.IGNORECASE
+)
+
+
+def is_simple_question(user_query: str) -> bool:
+    """Short questions without join/grouping words skip the plan"""
+    return (
+        len(user_query.split()) < SIMPLE_QUERY_MAX_WORDS
+        and not _COMPLEX_QUESTION_RE.search(user_query)
     )
+
+
+def plan_and_sql_messages(user_query: str) -> List[Dict[str, str]]:
+    """Opening messages of a question's conversation (schema + plan/SQL request)"""
+    return [
+        {"role": "system", "content": SCHEMA_SYSTEM_PROMPT},
+        {"role": "user", "content": f"{PLAN_AND_SQL_INSTRUCTIONS}\n\nUSER QUESTION: {user_query}"}
+    ]
+
+
+def direct_sql_messages(user_query: str) -> List[Dict[str, str]]:
+    """Opening messages of a question answered without a plan (schema + SQL request)"""
+    return [
+        {"role": "system", "content": SCHEMA_SYSTEM_PROMPT},
+        {"role": "user", "content": f"{DIRECT_SQL_INSTRUCTIONS}\n\nUSER QUESTION: {user_query}\n\nSQL:"}
+    ]
+
+
+async def generate_plan_and_sql(
+    user_query: str,
+    ctx: Context = None,
+    use_cache: bool = True
+) -> tuple[str, str]:
+    """
+    Generate reasoning plan (Chain-of-Thought) and SQL in a single LLM call
+    """
     
-    sql = response.choices[0].message.content.strip()
-    sql = sql.replace('```sql', '').replace('```', '').strip()
+    if ctx:
+        await ctx.info("🧠 Generating query plan and SQL...")
+    
+    response = await chat_completion(
+        plan_and_sql_messages(user_query),
+        max_tokens=token_budget(user_query, 600, PLAN_MAX_TOKENS),
+        stop_when=plan_and_sql_is_complete,
+        use_cache=use_cache
+    )
+    plan, sql = split_plan_and_sql(response)
     
+    logger.info(f"📋 Query Plan:\n{plan}")
     logger.info(f"🔧 Generated SQL: {sql[:150]}...")
     
-    return sql
+    return plan, sql
 
 
 async def fix_sql_with_context(
     user_query: str,
     plan: str,
-    failed_sql: str,
-    error: str,
-    catalog: str,
-    ctx: Context = None
+    failures: List[tuple[str, str]],
+    ctx: Context = None,
+    use_cache: bool = True
 ) -> str:
     """
-    Fix SQL with context from original plan
+    Fix SQL by continuing the original conversation with each failed attempt and its error
     """
     
     if ctx:
-        await ctx.info("🔧 Fixing SQL with plan context...")
+        await ctx.info("🔧 Fixing SQL with plan context..." if plan else "🔧 Fixing SQL...")
+    
+    # Every retry extends the messages the first SQL actually came from, so the
+    # provider's prompt cache covers all earlier turns and only the newest error is fresh
+    first_sql = failures[0][0]
+    if plan:
+        messages = plan_and_sql_messages(user_query)
+        messages.append({"role": "assistant", "content": f"PLAN:\n{plan}\n\nSQL:\n{first_sql}"})
+        instructions = FIX_PLANNED_SQL_INSTRUCTIONS
+    else:
+        messages = direct_sql_messages(user_query)
+        messages.append({"role": "assistant", "content": first_sql})
+        instructions = FIX_SQL_INSTRUCTIONS
+    for i, (failed_sql, error) in enumerate(failures):
+        if i:
+            messages.append({"role": "assistant", "content": failed_sql})
+        messages.append({
+            "role": "user",
+            "content": f"{instructions}\n\nERROR:\n{error}\n\nFIXED SQL:"
+        })
+    
+    fixed_sql = await chat_completion(
+        messages,
+        max_tokens=token_budget(failures[-1][0], 300, SQL_MAX_TOKENS),
+        stop_when=sql_is_complete,
+        use_cache=use_cache
+    )
+    fixed_sql = extract_sql(fixed_sql)
+    
+    logger.info(f"🔧 Fixed SQL: {fixed_sql[:150]}...")
     
-    prompt = f"""Fix this SQL query that failed.
+    return fixed_sql
 
-DATABASE SCHEMA:
-{catalog}
 
-{RELATIONSHIP_MAP}
+async def generate_alternative_sql(user_query: str, plan: str, sql: str, use_cache: bool = True) -> str:
+    """
+    Speculatively write a different SQL for the same plan, used if the first one fails
+    """
+    
+    prompt = f"""{ALTERNATIVE_SQL_INSTRUCTIONS}
 
 ORIGINAL QUESTION: {user_query}
 
 QUERY PLAN (your reasoning):
 {plan}
 
-FAILED SQL:
-{failed_sql}
+FIRST SQL:
+{sql}
 
-ERROR:
-{error}
+ALTERNATIVE SQL:"""
+    
+    try:
+        alternative = await chat_completion(
+            [
+                {"role": "system", "content": SCHEMA_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=token_budget(sql, 300, SQL_MAX_TOKENS),
+            stop_when=sql_is_complete,
+            use_cache=use_cache
+        )
+    except Exception as e:
+        logger.warning(f"Alternative SQL generation failed: {e}")
+        return ""
+    
+    return extract_sql(alternative)
 
-INSTRUCTIONS:
-- The plan is correct, but SQL has an error
-- Fix the SQL based on the error message
-- Keep following the original plan
-- Common issues: wrong column names, missing JOINs, type mismatches
-- Return ONLY the corrected SQL
 
-FIXED SQL:"""
+async def generate_sql_direct(user_query: str, use_cache: bool = True) -> str:
+    """
+    Generate SQL straight from the question, without a plan
+    """
     
-    response = llm_client.client.chat.completions.create(
-        model=llm_client.model,
-        max_tokens=2000,
-        temperature=0,
-        messages=[{"role": "user", "content": prompt}]
+    sql = await chat_completion(
+        direct_sql_messages(user_query),
+        max_tokens=token_budget(user_query, 300, SQL_MAX_TOKENS),
+        stop_when=sql_is_complete,
+        use_cache=use_cache
     )
-    
-    fixed_sql = response.choices[0].message.content.strip()
-    fixed_sql = fixed_sql.replace('```sql', '').replace('```', '').strip()
-    
-    logger.info(f"🔧 Fixed SQL: {fixed_sql[:150]}...")
-    
-    return fixed_sql
+    return extract_sql(sql)
 
 
 # ============================================================================
 # MCP Tools
 # ============================================================================
 
+class SharedProgress:
+    """Progress sink for a coalesced text_to_sql run, fanned out to every waiting caller"""
+    
+    def __init__(self):
+        self.contexts: List[Context] = []
+    
+    async def _send(self, level: str, message: str):
+        for ctx in list(self.contexts):
+            try:
+                await getattr(ctx, level)(message)
+            except Exception:
+                # Caller went away; the shared run and the other callers carry on
+                if ctx in self.contexts:
+                    self.contexts.remove(ctx)
+    
+    async def info(self, message: str):
+        await self._send("info", message)
+    
+    async def warning(self, message: str):
+        await self._send("warning", message)
+    
+    async def error(self, message: str):
+        await self._send("error", message)
+
+
 @mcp.tool()
 async def text_to_sql(
     query: str,
     execute: bool = True,
     limit: int = 100,
     use_cache: bool = True,
+    rows_format: str = "records",
     ctx: Context = None
 ) -> str:
     """
@@ -360,7 +930,7 @@ async def text_to_sql(
     
     This version uses Chain-of-Thought reasoning:
     1. First generates a query plan (which tables, joins, filters)
-    2. Then generates SQL based on that plan
+    2. Then generates SQL based on that plan (same LLM call as the plan)
     3. If errors occur, fixes SQL while maintaining the plan
     
     Args:
@@ -368,81 +938,161 @@ async def text_to_sql(
         execute: Whether to execute the SQL (default: True)
         limit: Maximum rows to return (default: 100)
         use_cache: Check cache for similar queries (default: True)
+        rows_format: "records" for one object per row, or "columnar" for row
+            value lists matching "columns" (smaller payload) (default: "records")
     
     Returns:
         JSON with plan, SQL, results, and metadata
     """
     
+    if not use_cache:
+        return await _text_to_sql(query, execute, limit, use_cache, rows_format, ctx)
+    
+    # Coalesce with an identical question that is already being answered. The shared
+    # run reports progress to every waiting caller, not only to the one that started it.
+    key = (normalize_query(query), execute, limit, rows_format)
+    entry = inflight_queries.get(key)
+    if entry is None:
+        progress = SharedProgress()
+        task = asyncio.create_task(_text_to_sql(query, execute, limit, use_cache, rows_format, progress))
+        inflight_queries[key] = (task, progress)
+        task.add_done_callback(lambda _: inflight_queries.pop(key, None))
+        shared = False
+    else:
+        task, progress = entry
+        shared = True
+    
     if ctx:
-        await ctx.info(f"📝 Query: {query[:100]}...")
+        progress.contexts.append(ctx)
+    try:
+        if shared and ctx:
+            await ctx.info("⏳ Same question already in progress, sharing its result")
+        # Shielded so one caller disconnecting doesn't cancel the others' result
+        return await asyncio.shield(task)
+    finally:
+        if ctx in progress.contexts:
+            progress.contexts.remove(ctx)
+
+
+async def _text_to_sql(
+    query: str,
+    execute: bool = True,
+    limit: int = 100,
+    use_cache: bool = True,
+    rows_format: str = "records",
+    ctx: Context = None
+) -> str:
+    """Run the plan -> SQL -> execute pipeline for one question"""
     
-    start_time = datetime.now()
+    start_time = time.perf_counter()
+    alt_task = None
     
     try:
+        if ctx:
+            await ctx.info(f"📝 Query: {query[:100]}...")
+        
         # Check cache first
+        query_embedding = None
         if use_cache and execute:
             cached = get_cached_query(query)
-            if cached:
+            if not cached and semantic_index is not None:
+                query_embedding = await embed_query(query)
+                cached = get_similar_cached_query(query_embedding)
+            # Only reuse a cached result that holds enough rows for this limit
+            if cached and (
+                cached['results']['row_count'] >= limit
+                or not cached['results'].get('truncated', True)
+            ):
                 if ctx:
                     await ctx.info("🎯 Using cached result!")
                 
-                return json.dumps({
+                return dump_json({
                     'query': query,
                     'sql': cached['sql'],
                     'success': True,
                     'cached': True,
                     'columns': cached['results']['columns'] if cached['results'] else [],
-                    'rows': (cached['results']['rows'][:limit] if cached['results'] else []),
+                    'rows': format_rows(
+                        cached['results']['columns'], cached['results']['rows'][:limit], rows_format
+                    ) if cached['results'] else [],
                     'row_count': len(cached['results']['rows'][:limit]) if cached['results'] else 0,
                     'total_time': 0.001  # Instant from cache
-                }, indent=2, default=str)
+                })
         
-        # Stage 1: Generate query plan
-        plan = await generate_query_plan(query, catalog_content, ctx)
-        
-        # Stage 2: Generate SQL from plan
-        sql = await generate_sql_from_plan(query, plan, catalog_content, ctx)
+        # Generate query plan and SQL in one round trip
+        if is_simple_question(query):
+            if ctx:
+                await ctx.info("⚡ Simple question, generating SQL directly...")
+            plan, sql = "", await generate_sql_direct(query, use_cache)
+        else:
+            plan, sql = await generate_plan_and_sql(query, ctx, use_cache)
         
         if not execute:
-            return json.dumps({
+            return dump_json({
                 'query': query,
                 'plan': plan,
                 'sql': sql,
                 'executed': False,
-                'total_time': (datetime.now() - start_time).total_seconds()
-            }, indent=2)
+                'total_time': time.perf_counter() - start_time
+            })
         
         # Execute with retry (now with plan context)
         current_sql = sql
+        tried_sqls: List[str] = []
+        failures: List[tuple[str, str]] = []  # (sql, error) per failed attempt, in order
         
         for attempt in range(MAX_RETRIES):
             if ctx:
                 await ctx.info(f"🔍 Attempt {attempt + 1}/{MAX_RETRIES}")
             
+            # A fix that repeats an earlier attempt would fail the same way
+            current_sql = sanitize_sql(current_sql)
+            if current_sql in tried_sqls:
+                return dump_json({
+                    'query': query,
+                    'plan': plan,
+                    'sql': current_sql,
+                    'success': False,
+                    'error': f"Fix repeated an earlier SQL, giving up: {failures[-1][1]}",
+                    'attempts': attempt
+                })
+            tried_sqls.append(current_sql)
+            
             # Validate
             is_valid, error_msg = validate_sql(current_sql)
             if not is_valid:
+                failures.append((current_sql, f"Validation error: {error_msg}"))
                 if ctx:
                     await ctx.error(f"❌ Validation failed: {error_msg}")
                 
-                if attempt == MAX_RETRIES - 1:
-                    return json.dumps({
+                if attempt == MAX_RETRIES - 1 or error_msg in UNFIXABLE_VALIDATION_ERRORS:
+                    return dump_json({
                         'query': query,
                         'plan': plan,
                         'sql': current_sql,
                         'success': False,
                         'error': f"Validation error: {error_msg}",
                         'attempts': attempt + 1
-                    }, indent=2)
+                    })
                 
                 # Fix with plan context
-                current_sql = await fix_sql_with_context(
-                    query, plan, current_sql, error_msg, catalog_content, ctx
-                )
+                current_sql = await fix_sql_with_context(query, plan, failures, ctx, use_cache)
                 continue
             
+            # Optional planner pre-flight: fail fast without running the query
+            preflight_error = await explain_sql(current_sql) if ENABLE_EXPLAIN_PREFLIGHT else None
+            
+            # Pre-generate a fallback while the first attempt runs
+            if ENABLE_SPECULATIVE_RETRY and attempt == 0:
+                alt_task = asyncio.create_task(
+                    generate_alternative_sql(query, plan, current_sql, use_cache)
+                )
+            
             # Execute
-            result = execute_sql(current_sql)
+            if preflight_error:
+                result = {'success': False, 'sql': current_sql, 'error': preflight_error}
+            else:
+                result = await execute_sql(current_sql, limit)
             
             if result['success']:
                 if ctx:
@@ -451,7 +1101,7 @@ async def text_to_sql(
                     )
                 
                 # Cache successful query
-                cache_query(query, result['sql'], True, result)
+                cache_query(query, result['sql'], True, result, query_embedding)
                 
                 response = {
                     'query': query,
@@ -460,45 +1110,55 @@ async def text_to_sql(
                     'success': True,
                     'cached': False,
                     'columns': result['columns'],
-                    'rows': result['rows'][:limit],
-                    'row_count': min(result['row_count'], limit),
-                    'total_rows': result['row_count'],
+                    'rows': format_rows(result['columns'], result['rows'], rows_format),
+                    'row_count': result['row_count'],
+                    'truncated': result['truncated'],
                     'execution_time': result['execution_time'],
-                    'total_time': (datetime.now() - start_time).total_seconds(),
+                    'total_time': time.perf_counter() - start_time,
                     'attempts': attempt + 1
                 }
                 
-                return json.dumps(response, indent=2, default=str)
+                return dump_json(response)
             
             # Failed - log and retry
+            failures.append((current_sql, result['error']))
             if ctx:
                 await ctx.warning(f"⚠️ Error: {result['error'][:100]}")
             
-            if attempt == MAX_RETRIES - 1:
-                return json.dumps({
+            # A busy pool is not the SQL's fault; an LLM fix would only rewrite valid SQL
+            if attempt == MAX_RETRIES - 1 or result.get('infrastructure_error'):
+                return dump_json({
                     'query': query,
                     'plan': plan,
                     'sql': result['sql'],
                     'success': False,
                     'error': result['error'],
                     'attempts': attempt + 1
-                }, indent=2)
+                })
+            
+            # Use the speculative alternative before paying for a fix round trip
+            if alt_task is not None:
+                alternative = await alt_task
+                alt_task = None
+                if alternative and sanitize_sql(alternative) not in tried_sqls:
+                    if ctx:
+                        await ctx.info("⚡ Trying pre-generated alternative SQL...")
+                    current_sql = alternative
+                    continue
             
             # Fix with plan context
             if ctx:
                 await ctx.info("🔧 Attempting to fix SQL with plan context...")
             
-            current_sql = await fix_sql_with_context(
-                query, plan, current_sql, result['error'], catalog_content, ctx
-            )
+            current_sql = await fix_sql_with_context(query, plan, failures, ctx, use_cache)
         
-        return json.dumps({
+        return dump_json({
             'query': query,
             'plan': plan,
             'success': False,
             'error': 'Max retries exceeded',
             'attempts': MAX_RETRIES
-        }, indent=2)
+        })
         
     except Exception as e:
         if ctx:
@@ -506,11 +1166,49 @@ async def text_to_sql(
         
         logger.error(f"Error in text_to_sql: {e}", exc_info=True)
         
-        return json.dumps({
+        return dump_json({
             'query': query,
             'success': False,
             'error': str(e)
-        }, indent=2)
+        })
+    
+    finally:
+        if alt_task is not None and not alt_task.done():
+            alt_task.cancel()
+
+
+@mcp.tool()
+async def execute_sql_stream(sql: str, chunk_size: int = 1000, rows_format: str = "records") -> str:
+    """
+    Run a SELECT and page through its full result set
+    
+    Returns the first chunk_size rows and, unless done, a cursor_handle for fetch_next.
+    Handles expire after STREAM_CURSOR_TTL idle seconds.
+    
+    Args:
+        sql: SELECT (or WITH) statement to run
+        chunk_size: Rows per chunk (capped at MAX_RESULT_ROWS)
+        rows_format: "records" (list of dicts) or "columnar" (list of lists)
+    """
+    sql = sanitize_sql(sql)
+    is_valid, error = validate_sql(sql)
+    if not is_valid:
+        return dump_json({'sql': sql, 'success': False, 'error': error})
+    
+    chunk_size = max(1, min(chunk_size, MAX_RESULT_ROWS))
+    result = await asyncio.to_thread(_open_stream_blocking, sql, chunk_size)
+    if result['success']:
+        result['rows'] = format_rows(result['columns'], result['rows'], rows_format)
+    return dump_json(result)
+
+
+@mcp.tool()
+async def fetch_next(cursor_handle: str, rows_format: str = "records") -> str:
+    """Fetch the next chunk of an execute_sql_stream result"""
+    result = await asyncio.to_thread(_fetch_stream_blocking, cursor_handle)
+    if result['success']:
+        result['rows'] = format_rows(result['columns'], result['rows'], rows_format)
+    return dump_json(result)
 
 
 @mcp.tool()
@@ -522,40 +1220,118 @@ async def get_schema() -> str:
 @mcp.tool()
 async def get_cache_stats() -> str:
     """Get query cache statistics"""
+    # Only successful queries are cached
     total = len(query_cache)
-    successful = sum(1 for q in query_cache.values() if q['success'])
     
-    return json.dumps({
+    return dump_json({
         'cache_enabled': ENABLE_QUERY_CACHE,
         'total_cached_queries': total,
-        'successful_queries': successful,
-        'cache_size_mb': len(str(query_cache)) / 1024 / 1024
-    }, indent=2)
+        'successful_queries': total,
+        'max_cached_queries': QUERY_CACHE_MAX,
+        'ttl_seconds': QUERY_CACHE_TTL,
+        'cache_size_mb': query_cache_bytes / 1024 / 1024,
+        'persistent_path': QUERY_CACHE_PATH or None,
+        'semantic_cache_enabled': semantic_index is not None,
+        'exact_hits': cache_counters['exact_hits'],
+        'semantic_hits': cache_counters['semantic_hits'],
+        'misses': cache_counters['misses'],
+        'hit_rate': (
+            (cache_counters['exact_hits'] + cache_counters['semantic_hits'])
+            / max(1, sum(cache_counters.values()))
+        ),
+        'llm_cache': {
+            'enabled': llm_cache.enabled,
+            'backend': llm_cache.backend_name,
+            'hits': llm_cache.hits,
+            'misses': llm_cache.misses
+        }
+    })
 
 
 @mcp.tool()
 async def clear_cache() -> str:
     """Clear the query cache"""
+    global query_cache_bytes
     query_cache.clear()
-    return json.dumps({'message': 'Cache cleared', 'success': True}, indent=2)
+    query_cache_bytes = 0
+    if semantic_index is not None:
+        semantic_index.clear()
+    if query_store is not None:
+        query_store.clear()
+    await llm_cache.clear()
+    return dump_json({'message': 'Cache cleared', 'success': True})
+
+
+# Last health probe as (monotonic time, db_ok), shared by frequent health() polls
+_last_db_probe = (float('-inf'), False)
+
+
+def _check_db_blocking() -> bool:
+    """Run SELECT 1 on a pooled connection (blocking, runs in a worker thread)"""
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
+    except Exception:
+        return False
+    finally:
+        if conn:
+            db_pool.putconn(conn)
+
+
+def _ping_idle_connections():
+    """Run SELECT 1 on up to DB_POOL_MIN idle pooled connections, dropping any that fail"""
+    # Only take connections that are idle right now (psycopg2 keeps them in _pool),
+    # so a ping never opens new ones or leaves requests waiting for the pool
+    idle = min(DB_POOL_MIN, len(db_pool._pool))
+    conns = []
+    dead = []
+    try:
+        for _ in range(idle):
+            try:
+                conns.append(db_pool.getconn())
+            except (PoolError, psycopg2.Error):
+                break  # pool got busy or a reconnect failed; ping what we have
+        
+        for conn in conns:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except Exception:
+                dead.append(conn)
+    finally:
+        for conn in conns:
+            db_pool.putconn(conn, close=conn in dead)
+    
+    if dead:
+        logger.warning(f"⚠️ Dropped {len(dead)} dead pooled DB connection(s)")
+
+
+def _keep_pool_warm():
+    """Background loop: ping idle connections so the next query finds a live one"""
+    while True:
+        time.sleep(DB_PING_INTERVAL)
+        try:
+            _sweep_streams()
+            _ping_idle_connections()
+        except Exception as e:
+            logger.warning(f"DB pool ping failed: {e}")
 
 
 @mcp.tool()
 async def health() -> str:
     """Check server health"""
+    global _last_db_probe
     
-    db_ok = False
-    try:
-        conn = db_pool.getconn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-        db_pool.putconn(conn)
-        db_ok = True
-    except:
-        pass
-    
-    return json.dumps({
+    checked_at, db_ok = _last_db_probe
+    if time.monotonic() - checked_at >= HEALTH_CACHE_TTL:
+        async with db_semaphore:
+            db_ok = await asyncio.to_thread(_check_db_blocking)
+        _last_db_probe = (time.monotonic(), db_ok)
+    
+    return dump_json({
         'status': 'healthy' if db_ok else 'degraded',
         'database': 'healthy' if db_ok else 'unhealthy',
         'catalog_loaded': len(catalog_content) > 100,
@@ -563,12 +1339,13 @@ async def health() -> str:
         'max_retries': MAX_RETRIES,
         'cache_enabled': ENABLE_QUERY_CACHE,
         'cached_queries': len(query_cache),
+        'open_streams': len(open_streams),
         'features': {
             'two_stage_reasoning': True,
             'relationship_hints': True,
             'query_caching': ENABLE_QUERY_CACHE
         }
-    }, indent=2)
+    })
 
 
 # ============================================================================
@@ -579,16 +1356,33 @@ if __name__ == "__main__":
     logger.info("=" * 80)
     logger.info("🚀 Text-to-SQL MCP Server v2.0 (Two-Stage Reasoning)")
     logger.info(f"🤖 Model: {llm_client.model}")
-    logger.info(f"📄 Catalog: {CATALOG_PATH} ({len(catalog_content)} chars)")
+    logger.info(
+        f"📄 Catalog: {CATALOG_PATH} ({len(catalog_content)} chars, "
+        f"{len(PROMPT_CATALOG)} in prompt, ~{SCHEMA_PROMPT_TOKENS} prompt tokens)"
+    )
     logger.info(f"🔄 Max Retries: {MAX_RETRIES}")
+    logger.info(f"🚦 Max In-flight LLM Calls: {MAX_INFLIGHT_LLM}")
     logger.info(f"💾 Query Cache: {'Enabled' if ENABLE_QUERY_CACHE else 'Disabled'}")
     logger.info(f"🧠 Features: Two-Stage Reasoning + Relationship Hints")
     logger.info("=" * 80)
     
+    if DB_PING_INTERVAL > 0:
+        threading.Thread(target=_keep_pool_warm, name="db-pool-ping", daemon=True).start()
+    
+    # uvloop cuts scheduler overhead under many concurrent tool calls (optional)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("⚡ Event loop: uvloop")
+    except ImportError:
+        logger.info("Event loop: asyncio (pip install uvloop for a faster loop)")
+    
     try:
         # Run with Streamable HTTP
         mcp.run(transport="http", host="0.0.0.0", port=8000, path="/mcp")
     except KeyboardInterrupt:
         logger.info("\n👋 Shutting down...")
     finally:
+        if query_store is not None:
+            query_store.flush()
         db_pool.closeall()
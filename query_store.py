@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Persistent Query Cache Store for Text-to-SQL MCP Server
+SQLite file behind the in-memory query cache, so warm entries survive restarts.
+Writes are queued and applied by a background thread so they never block the event loop.
+"""
+
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStore:
+    """SQLite table of cached queries (WAL mode, writes applied in order by a worker thread)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_cache ("
+            "key TEXT PRIMARY KEY, entry TEXT NOT NULL, embedding TEXT, updated REAL NOT NULL)"
+        )
+        self.writes: queue.Queue = queue.Queue()
+        threading.Thread(target=self._write_loop, name="query-store", daemon=True).start()
+        logger.info(f"Query store opened at {path}")
+
+    def _write_loop(self):
+        """Apply queued writes one at a time, in the order they were made"""
+        while True:
+            action, sql, params = self.writes.get()
+            try:
+                with self.lock:
+                    self.conn.execute(sql, params)
+            except sqlite3.Error as e:
+                logger.warning(f"Query store {action} failed: {e}")
+            finally:
+                self.writes.task_done()
+
+    def flush(self):
+        """Block until every queued write has been applied"""
+        self.writes.join()
+
+    def load(self, limit: int) -> List[tuple]:
+        """Return up to `limit` most recent (key, entry, embedding), oldest first"""
+        try:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT key, entry, embedding FROM query_cache ORDER BY updated DESC LIMIT ?",
+                    (limit,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Query store read failed: {e}")
+            return []
+
+        return [
+            (key, json.loads(entry), json.loads(embedding) if embedding else None)
+            for key, entry, embedding in reversed(rows)
+        ]
+
+    def save(self, key: str, entry: dict, embedding: Optional[list] = None):
+        """Queue an insert or replace of one entry"""
+        # Serialized now so later changes to the live entry don't leak into the row
+        self.writes.put((
+            "write",
+            "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?)",
+            (
+                key,
+                json.dumps(entry, separators=(',', ':')),
+                json.dumps(embedding) if embedding is not None else None,
+                time.time()
+            )
+        ))
+
+    def delete(self, key: str):
+        """Queue the removal of one entry"""
+        self.writes.put(("delete", "DELETE FROM query_cache WHERE key = ?", (key,)))
+
+    def clear(self):
+        """Queue the removal of all entries"""
+        self.writes.put(("clear", "DELETE FROM query_cache", ()))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Proactive OpenAI Rate Limiting for Text-to-SQL MCP Server
+Token buckets for requests/minute and tokens/minute (OPENAI_RPM, OPENAI_TPM)
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously up to `per_minute` tokens"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.refill_rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    async def consume(self, amount: float):
+        """Wait until `amount` tokens are available, then take them"""
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                await asyncio.sleep((amount - self.available) / self.refill_rate)
+
+
+class RateLimitedLLM:
+    """Throttles LLM calls to stay under the account's RPM/TPM limits
+
+    A limit of 0 (the default) disables that bucket.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        rpm = int(os.getenv("OPENAI_RPM", "0"))
+        tpm = int(os.getenv("OPENAI_TPM", "0"))
+        self.request_bucket = TokenBucket(rpm) if rpm > 0 else None
+        self.token_bucket = TokenBucket(tpm) if tpm > 0 else None
+        # Always loaded: prompt sizes also bound max_tokens, not just the TPM bucket
+        self.encoding = self._load_encoding(model)
+        self.static_token_counts: Dict[str, int] = {}
+
+        logger.info(f"Rate limiter initialized (rpm={rpm or 'unlimited'}, tpm={tpm or 'unlimited'})")
+
+    @staticmethod
+    def _load_encoding(model: str):
+        try:
+            import tiktoken
+        except ImportError:
+            logger.warning("tiktoken not installed, estimating tokens as chars/4")
+            return None
+
+        try:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # The BPE file is downloaded on first use; offline hosts fall back to chars/4
+            logger.warning(f"tiktoken encoding unavailable ({e}), estimating tokens as chars/4")
+            return None
+
+    def cache_token_count(self, text: str) -> int:
+        """Count a static prompt block once and remember the result"""
+        count = self.count_tokens(text)
+        self.static_token_counts[text] = count
+        return count
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens in text (chars/4 estimate without tiktoken)"""
+        cached = self.static_token_counts.get(text)
+        if cached is not None:
+            return cached
+        if self.encoding is None:
+            return len(text) // 4
+        return len(self.encoding.encode(text))
+
+    def prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Tokens in the messages' content"""
+        return sum(self.count_tokens(m["content"]) for m in messages)
+
+    async def acquire(self, messages: List[Dict[str, str]], max_tokens: int, prompt_tokens: int = None):
+        """Wait for request and token budget before calling the API"""
+        if self.request_bucket:
+            await self.request_bucket.consume(1)
+        if self.token_bucket:
+            if prompt_tokens is None:
+                prompt_tokens = self.prompt_tokens(messages)
+            await self.token_bucket.consume(prompt_tokens + max_tokens)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Result Serialization for Text-to-SQL MCP Server
+Converting DB values to JSON types and encoding tool responses
+"""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List
+
+try:
+    import orjson  # optional, faster JSON encoding
+except ImportError:
+    orjson = None
+
+# Tool responses are consumed by the agent, not read by humans
+COMPACT_JSON = (',', ':')
+
+_SERIALIZERS = {
+    datetime: datetime.isoformat,
+    Decimal: float,
+    bytes: lambda b: b.hex()[:50],
+    memoryview: lambda m: m.hex()[:50],
+}
+_JSON_SAFE = (str, int, float, bool)
+
+
+def serialize_value(value):
+    """Convert DB values to JSON-serializable"""
+    converter = _SERIALIZERS.get(type(value))
+    if converter:
+        return converter(value)
+    if value is None or isinstance(value, _JSON_SAFE):
+        return value
+    return str(value)
+
+
+def dump_json(obj: Any) -> str:
+    """Serialize a tool response compactly (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=serialize_value).decode()
+    return json.dumps(obj, separators=COMPACT_JSON, default=serialize_value)
+
+
+def serialize_column(values: List[Any]) -> List[Any]:
+    """Convert one result column, picking the converter once from its first non-null value"""
+    sample_type = type(next((v for v in values if v is not None), None))
+    converter = _SERIALIZERS.get(sample_type)
+    if converter is None:
+        if sample_type not in _JSON_SAFE:
+            return [serialize_value(v) for v in values]
+        converter = lambda v: v
+    
+    return [
+        v if v is None else converter(v) if type(v) is sample_type else serialize_value(v)
+        for v in values
+    ]
+
+
+def serialize_rows(rows: List[tuple], width: int) -> List[list]:
+    """Convert fetched rows column by column; rows stay positional (one shared column list)"""
+    converted = [serialize_column([row[i] for row in rows]) for i in range(width)]
+    return [list(values) for values in zip(*converted)]
+
+
+def format_rows(columns: List[str], rows: List[Any], rows_format: str) -> List[Any]:
+    """Shape positional result rows for a response: 'records' (dicts) or 'columnar' (lists)"""
+    if rows and isinstance(rows[0], dict):  # entries persisted before rows went positional
+        rows = [[row.get(column) for column in columns] for row in rows]
+    if rows_format == "columnar":
+        return rows
+    return [dict(zip(columns, row)) for row in rows]
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+SQL Text Helpers for Text-to-SQL MCP Server
+Pulling SQL out of LLM replies, stripping comments and deciding when a streamed
+statement is finished. Pure functions, no database or LLM access.
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional
+
+# Quoted string literals and identifiers: E'...' escape strings (backslash escapes),
+# standard '...', "..." identifiers, and $$...$$ / $tag$...$tag$ bodies
+_LITERAL = (
+    r"""(?<!\w)[Ee]'(?:[^'\\]|\\.|'')*'"""
+    r"""|'(?:[^']|'')*'|"(?:[^"]|"")*\""""
+    r"""|\$\$.*?\$\$|\$(?P<tag>[A-Za-z_]\w*)\$.*?\$(?P=tag)\$"""
+)
+
+# String literals are matched first so their contents are left untouched
+_SANITIZE_RE = re.compile(
+    rf"""({_LITERAL})|(?:\s|--[^\n]*|/\*.*?\*/)+""",
+    re.DOTALL
+)
+# Same, but whitespace is kept so line structure survives masking
+_MASK_RE = re.compile(rf"""({_LITERAL})|--[^\n]*|/\*.*?\*/""", re.DOTALL)
+# A quote left over after masking belongs to a literal that is still open
+_OPEN_QUOTE_RE = re.compile(r"""['"]|\$(?:[A-Za-z_]\w*)?\$""")
+# Where bare SQL can end: a ';', a fence, or a blank line followed by a capitalized word
+_BOUNDARY_RE = re.compile(r';|```|\n[ \t]*\n\s*([A-Z][a-z]+)(?=[\s:,.])')
+# Words that may start the next line of a statement; anything else after a blank line is prose
+_SQL_KEYWORDS = frozenset({
+    'SELECT', 'FROM', 'WHERE', 'JOIN', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'OUTER', 'CROSS',
+    'NATURAL', 'LATERAL', 'ON', 'USING', 'AND', 'OR', 'NOT', 'GROUP', 'ORDER', 'BY', 'HAVING',
+    'LIMIT', 'OFFSET', 'FETCH', 'UNION', 'INTERSECT', 'EXCEPT', 'ALL', 'DISTINCT', 'WITH', 'AS',
+    'CASE', 'WHEN', 'THEN', 'ELSE', 'END', 'IN', 'IS', 'NULL', 'LIKE', 'ILIKE', 'BETWEEN',
+    'EXISTS', 'WINDOW', 'OVER', 'PARTITION', 'VALUES', 'ASC', 'DESC', 'NULLS', 'FILTER',
+})
+_PARENS_RE = re.compile(r'\([^()]*\)')
+_SELECT_RE = re.compile(r'\bSELECT\b', re.IGNORECASE)
+
+_LEADING_RE = re.compile(r'^\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+# One scan finds forbidden keywords, a LIMIT clause and semicolons; word-bounded,
+# so identifiers like credit_limit don't count as a LIMIT clause
+_SCAN_RE = re.compile(
+    r'\b(?:(DROP|DELETE|UPDATE|INSERT|TRUNCATE|ALTER|CREATE|GRANT|REVOKE'
+    r'|EXEC|EXECUTE|CALL|COMMIT|ROLLBACK)|(LIMIT))\b|(;)',
+    re.IGNORECASE
+)
+
+_FENCED_SQL_RE = re.compile(r'```(?:sql)?\s*(.*?)```', re.IGNORECASE | re.DOTALL)
+# WITH only counts when it opens a CTE, so prose like "With the plan above:" is skipped
+_BARE_SQL_RE = re.compile(
+    r'^\s*(?:SELECT\b|WITH\s+(?:RECURSIVE\s+)?\w+(?:\s*\([^)]*\))?\s+AS\s*'
+    r'(?:(?:NOT\s+)?MATERIALIZED\s*)?\().*',
+    re.IGNORECASE | re.DOTALL | re.MULTILINE
+)
+
+
+def mask_literals(sql: str) -> str:
+    """Replace quoted literals with 0 and comments with a space, for scanning SQL structure"""
+    return _MASK_RE.sub(lambda m: '0' if m.group(1) else ' ', sql)
+
+
+def _mask_in_place(sql: str) -> str:
+    """mask_literals, but every masked character is replaced so offsets still line up"""
+    return _MASK_RE.sub(lambda m: ('0' if m.group(1) else ' ') * len(m.group(0)), sql)
+
+
+def sanitize_sql(sql: str) -> str:
+    """Strip comments, collapse whitespace and drop trailing semicolons"""
+    cleaned = _SANITIZE_RE.sub(lambda m: m.group(1) or ' ', sql)
+    return cleaned.strip().rstrip(';').strip()
+
+
+@lru_cache(maxsize=4096)  # pure function of the SQL text
+def analyze_sql(sql: str) -> tuple[bool, str, bool]:
+    """Validate SQL and detect its LIMIT clause in one pass: (is_valid, error, has_limit)"""
+    if not _LEADING_RE.match(sql):
+        return False, "Only SELECT queries allowed", False
+
+    # Keywords and semicolons inside string literals are data, not SQL
+    masked = mask_literals(sql)
+    # A quote left unmasked means the literals could not be delimited; don't guess
+    if _OPEN_QUOTE_RE.search(masked):
+        return False, "Unterminated string literal", False
+
+    has_limit = False
+    for match in _SCAN_RE.finditer(masked):
+        keyword, limit_kw, semicolon = match.groups()
+        if keyword:
+            return False, f"Keyword '{keyword.upper()}' not allowed", has_limit
+        if limit_kw:
+            has_limit = True
+        # A semicolon may only terminate the statement
+        elif semicolon and masked[match.end():].strip().strip(';'):
+            return False, "Multiple statements not allowed", has_limit
+
+    return True, "", has_limit
+
+
+def find_sql(text: str) -> Optional[str]:
+    """The SQL in an LLM reply (first fenced block, else first SELECT/WITH line on), or None"""
+    match = _FENCED_SQL_RE.search(text)
+    if match:
+        return match.group(1).strip()
+    match = _BARE_SQL_RE.search(text)
+    if not match:
+        return None
+    # Drop any explanation the model wrote after the statement
+    return match.group(0)[:_bare_sql_end(match.group(0))].strip()
+
+
+def extract_sql(text: str) -> str:
+    """Pull the SQL out of an LLM reply, falling back to the whole reply"""
+    sql = find_sql(text)
+    return text.strip() if sql is None else sql
+
+
+def _statement_is_closed(masked: str) -> bool:
+    """True if masked SQL has balanced parentheses and, for a CTE, its main SELECT"""
+    # Collapse parenthesized groups; anything left unbalanced is still open
+    outer, previous = masked, None
+    while outer != previous:
+        previous, outer = outer, _PARENS_RE.sub('0', outer)
+    if '(' in outer or ')' in outer:
+        return False
+    # A CTE list is only finished once its main SELECT has started
+    return not outer.lstrip().upper().startswith('WITH') or bool(_SELECT_RE.search(outer))
+
+
+def _bare_sql_end(sql: str) -> Optional[int]:
+    """Offset where bare SQL ends, or None while it may still continue
+
+    The statement ends after a ';' or at a fence outside string literals, or at a blank
+    line followed by prose once its parentheses are balanced. A blank line followed by
+    more SQL (e.g. "SELECT count(*)\n\nFROM users") does not end it.
+    """
+    masked = _mask_in_place(sql)
+    for match in _BOUNDARY_RE.finditer(masked):
+        # A quote still open here is an unterminated literal; nothing after it can end the SQL
+        if _OPEN_QUOTE_RE.search(masked, 0, match.start()):
+            return None
+        word = match.group(1)
+        if word is None:
+            return match.end() if match.group(0) == ';' else match.start()
+        if word.upper() not in _SQL_KEYWORDS and _statement_is_closed(masked[:match.start()]):
+            return match.start()
+    return None
+
+
+def sql_is_complete(text: str) -> bool:
+    """True once text holds a finished statement
+
+    A fenced block ends at its closing fence. Bare SQL ends at a ';' outside string
+    literals, at a fence, or at a blank line followed by prose. Anything before the
+    SQL starts (a prose preamble) never ends the stream.
+    """
+    fence = text.find('```')
+    bare = _BARE_SQL_RE.search(text)
+    if fence != -1 and (bare is None or fence < bare.start()):
+        return text.find('```', fence + 3) != -1
+    return bare is not None and _bare_sql_end(bare.group(0)) is not None
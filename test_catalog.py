@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Tests for catalog (run with: python -m pytest)
+"""
+
+import time
+
+from catalog import compact_catalog
+
+
+def test_compact_catalog_strips_table_layout():
+    text = (
+        "## Table: `users`\n"
+        "\n\n\n"
+        "| Column   | Type    |\n"
+        "|:---------|--------:|\n"
+        "| id       | integer |\n"
+        "---\n"
+        "Notes:  keep   text"
+    )
+    assert compact_catalog(text) == (
+        "## Table: `users`\n\n|Column|Type|\n|id|integer|\nNotes: keep text"
+    )
+
+
+def test_compact_catalog_is_linear_on_long_dash_runs():
+    separator = "-" * 2000 + "+" + "-" * 2000
+    start = time.perf_counter()
+    assert compact_catalog(f"a\n{separator}\nb") == f"a\n{separator}\nb"
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for llm_cache (run with: python -m pytest)
+"""
+
+import asyncio
+
+import pytest
+
+from llm_cache import LLMCache, MemoryBackend, make_cache_key
+
+
+def test_cache_key_is_stable_and_prompt_sensitive():
+    messages = [{"role": "user", "content": "How many users?"}]
+    assert make_cache_key("m", messages) == make_cache_key("m", [dict(m) for m in messages])
+    assert make_cache_key("m", messages) != make_cache_key("other", messages)
+    assert make_cache_key("m", messages) != make_cache_key("m", [{"role": "user", "content": "x"}])
+
+
+def test_memory_backend_evicts_least_recently_used():
+    async def run():
+        backend = MemoryBackend(max_entries=2)
+        await backend.set("a", "1")
+        await backend.set("b", "2")
+        assert await backend.get("a") == "1"  # a is now most recent
+        await backend.set("c", "3")
+        return [await backend.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == ["1", None, "3"]
+
+
+def test_llm_cache_counts_hits_and_misses(monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_REDIS_URL", raising=False)
+    monkeypatch.setenv("ENABLE_LLM_CACHE", "true")
+
+    async def run():
+        cache = LLMCache()
+        assert await cache.get("k") is None
+        await cache.set("k", "v")
+        assert await cache.get("k") == "v"
+        return cache
+
+    cache = asyncio.run(run())
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_semantic_index_finds_closest_question():
+    pytest.importorskip("numpy")
+    from llm_cache import SemanticIndex
+
+    index = SemanticIndex(threshold=0.9)
+    index.add("users", [1.0, 0.0])
+    index.add("orders", [0.0, 1.0])
+    key, score = index.search([0.99, 0.05])
+    assert key == "users" and score > 0.9
+    assert index.search([0.7, 0.7]) is None
+
+    index.remove("users")
+    assert index.search([1.0, 0.0]) is None
+    assert index.search([0.0, 1.0])[0] == "orders"
+
+
+def test_llm_cache_clear_drops_entries(monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_REDIS_URL", raising=False)
+
+    async def run():
+        cache = LLMCache()
+        await cache.set("k", "v")
+        await cache.clear()
+        return await cache.get("k")
+
+    assert asyncio.run(run()) is None
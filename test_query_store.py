@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Tests for query_store (run with: python -m pytest)
+"""
+
+from query_store import QueryStore
+
+
+def test_writes_are_applied_in_order(tmp_path):
+    store = QueryStore(str(tmp_path / "cache.db"))
+    store.save("a", {"sql": "SELECT 1"}, [0.5])
+    store.save("b", {"sql": "SELECT 2"})
+    store.delete("a")
+    store.flush()
+    assert store.load(10) == [("b", {"sql": "SELECT 2"}, None)]
+
+    store.clear()
+    store.save("c", {"sql": "SELECT 3"})
+    store.flush()
+    assert [key for key, _, _ in store.load(10)] == ["c"]
+
+
+def test_entries_survive_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    store = QueryStore(path)
+    store.save("a", {"sql": "SELECT 1"}, [0.25, 0.75])
+    store.flush()
+    assert QueryStore(path).load(10) == [("a", {"sql": "SELECT 1"}, [0.25, 0.75])]
+
+
+def test_save_snapshots_the_entry(tmp_path):
+    store = QueryStore(str(tmp_path / "cache.db"))
+    entry = {"hits": 1}
+    store.save("a", entry)
+    entry["hits"] = 2
+    store.flush()
+    assert store.load(1)[0][1] == {"hits": 1}
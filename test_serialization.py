@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for serialization (run with: python -m pytest)
+"""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from serialization import dump_json, format_rows, serialize_column, serialize_rows, serialize_value
+
+
+def test_serialize_value_converts_db_types():
+    assert serialize_value(Decimal("1.5")) == 1.5
+    assert serialize_value(datetime(2024, 1, 2, 3, 4, 5)) == "2024-01-02T03:04:05"
+    assert serialize_value(b"\x01\x02") == "0102"
+    assert serialize_value(None) is None
+    assert serialize_value(7) == 7
+
+
+def test_serialize_column_handles_nulls_and_mixed_types():
+    assert serialize_column([None, Decimal("2"), Decimal("3.5")]) == [None, 2.0, 3.5]
+    assert serialize_column([Decimal("1"), "x"]) == [1.0, "x"]
+    assert serialize_column([None, None]) == [None, None]
+
+
+def test_serialize_rows_keeps_rows_positional():
+    rows = [(1, Decimal("2.5")), (2, None)]
+    assert serialize_rows(rows, 2) == [[1, 2.5], [2, None]]
+    assert serialize_rows([], 2) == []
+
+
+def test_format_rows_records_and_columnar():
+    columns = ["id", "name"]
+    rows = [[1, "a"], [2, "b"]]
+    assert format_rows(columns, rows, "records") == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+    assert format_rows(columns, rows, "columnar") == rows
+    # Cache entries stored before rows went positional
+    assert format_rows(columns, [{"id": 1, "name": "a"}], "columnar") == [[1, "a"]]
+
+
+def test_dump_json_is_compact_and_converts_values():
+    text = dump_json({"a": [1, 2], "when": datetime(2024, 1, 2), "n": Decimal("1.5")})
+    assert " " not in text
+    assert json.loads(text) == {"a": [1, 2], "when": "2024-01-02T00:00:00", "n": 1.5}
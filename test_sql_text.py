@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for sql_text (run with: python -m pytest)
+"""
+
+from sql_text import analyze_sql, extract_sql, find_sql, mask_literals, sanitize_sql, sql_is_complete
+
+
+def test_prose_preamble_does_not_end_stream():
+    assert not sql_is_complete("Here is the SQL:\n\n")
+    assert not sql_is_complete("Here is the SQL:\n\n```sql\nSELECT count(*) FROM users\n")
+
+
+def test_fenced_block_ends_at_closing_fence():
+    reply = "Here is the SQL:\n\n```sql\nSELECT count(*) FROM users\n```"
+    assert sql_is_complete(reply)
+    assert extract_sql(reply) == "SELECT count(*) FROM users"
+    assert not sql_is_complete("```sql\nSELECT 1\n\nFROM t")
+
+
+def test_blank_line_cte_waits_for_main_select():
+    assert not sql_is_complete("WITH a AS (\n  SELECT 1\n)\n\n")
+    assert not sql_is_complete("WITH a AS (SELECT 1),\n\nb AS (SELECT 2)\n\n")
+    assert not sql_is_complete("WITH a AS (\n\n  SELECT 1")
+    assert not sql_is_complete("WITH a AS (SELECT 1)\n\nSELECT * FROM a\n\n")
+    assert sql_is_complete("WITH a AS (SELECT 1)\n\nSELECT * FROM a\n\nThis reads a. ")
+
+
+def test_blank_line_before_more_sql_does_not_end_stream():
+    assert not sql_is_complete("SELECT count(*)\n\n")
+    assert not sql_is_complete("SELECT count(*)\n\nFROM users WHERE ")
+    assert sql_is_complete("SELECT count(*)\n\nFROM users;")
+
+
+def test_blank_line_before_prose_ends_bare_select():
+    reply = "SELECT count(*)\nFROM users\n\nThis query counts "
+    assert sql_is_complete(reply)
+    assert extract_sql(reply) == "SELECT count(*)\nFROM users"
+    assert extract_sql("SELECT 1;\n\nNote: it's simple") == "SELECT 1;"
+
+
+def test_semicolon_inside_literal_does_not_end_stream():
+    assert not sql_is_complete("SELECT * FROM t WHERE name LIKE '%;")
+    assert not sql_is_complete("SELECT * FROM t WHERE name = ';'")
+    assert sql_is_complete("SELECT * FROM t WHERE name = ';';")
+
+
+def test_find_sql_returns_none_for_prose():
+    assert find_sql("Here is the SQL:") is None
+
+
+def test_sanitize_keeps_dollar_quoted_bodies():
+    assert sanitize_sql("SELECT $$a -- b$$") == "SELECT $$a -- b$$"
+    assert sanitize_sql("SELECT $q$x /* y */ $$ z$q$ -- c") == "SELECT $q$x /* y */ $$ z$q$"
+
+
+def test_mask_literals_hides_keywords_and_semicolons():
+    assert mask_literals("SELECT * FROM t WHERE a = 'UPDATE;' AND b LIKE $$%;%$$") == (
+        "SELECT * FROM t WHERE a = 0 AND b LIKE 0"
+    )
+
+
+def test_extract_sql_skips_prose_starting_with_with():
+    assert extract_sql("With the plan above:\nSELECT 1") == "SELECT 1"
+    assert extract_sql("WITH recent AS (SELECT 1) SELECT * FROM recent") == (
+        "WITH recent AS (SELECT 1) SELECT * FROM recent"
+    )
+    assert find_sql("with t(a, b) as materialized (select 1, 2) select a from t") is not None
+
+
+def test_analyze_sql_accepts_select_and_detects_limit():
+    assert analyze_sql("SELECT * FROM users") == (True, "", False)
+    assert analyze_sql("WITH a AS (SELECT 1) SELECT * FROM a LIMIT 5") == (True, "", True)
+    assert analyze_sql("SELECT credit_limit FROM accounts") == (True, "", False)
+    assert analyze_sql("SELECT 1;") == (True, "", False)
+
+
+def test_analyze_sql_ignores_keywords_and_semicolons_in_literals():
+    assert analyze_sql("SELECT * FROM t WHERE name LIKE '%;%'")[0]
+    assert analyze_sql("SELECT ';'")[0]
+    assert analyze_sql("SELECT * FROM audit WHERE action = 'UPDATE'")[0]
+    assert analyze_sql("SELECT * FROM t WHERE note = 'limit'")[2] is False
+    assert analyze_sql("SELECT E'it\\'s; DROP'")[0]
+
+
+def test_analyze_sql_rejects_unsafe_sql():
+    assert analyze_sql("DELETE FROM users") == (False, "Only SELECT queries allowed", False)
+    assert analyze_sql("SELECT 1; DROP TABLE users")[1] == "Multiple statements not allowed"
+    assert analyze_sql("SELECT * FROM users; UPDATE users SET a = 1")[0] is False
+    assert analyze_sql("WITH x AS (DELETE FROM users RETURNING *) SELECT * FROM x")[1] == (
+        "Keyword 'DELETE' not allowed"
+    )
+
+
+def test_analyze_sql_rejects_escape_string_smuggling():
+    sql = "SELECT E'a\\'b' ; DROP TABLE users; COMMIT; SELECT 'c'"
+    assert analyze_sql(sql)[0] is False
+    # Without the E prefix the backslash is literal and a quote is left open
+    assert analyze_sql("SELECT 'a\\'b' ; DROP TABLE users; SELECT 'c'") == (
+        False, "Unterminated string literal", False
+    )